@@ -0,0 +1,157 @@
+"""
+batchedRandom.py
+
+Per-device random-number source for the routines.
+
+Optional:
+    pip install numpy
+
+Without NumPy, new_rng() hands out a SimpleRNG instead: the same API
+on top of random.Random, slower and with different (but still
+seedable) sequences.
+
+The routine helpers draw several random numbers per generated frame.
+Going through the global `random` module means shared state between
+threads driving different boards and no way to replay a run.
+BatchedRNG pre-draws blocks of uniforms with NumPy, refills lazily, and
+serves them as plain Python floats. It has the same method names as
+`random` (random, uniform, randint, choice, shuffle), so anything that
+takes `rng=random` can be handed a BatchedRNG instead.
+
+The same seed gives the same sequence of draws. A stream made by
+spawn() is replayed from the root seed plus its spawn_key:
+BatchedRNG(rng.seed, spawn_key=rng.spawn_key). Routines that loop on
+wall-clock time can still consume a different number of draws per run.
+
+A BatchedRNG is not thread-safe: give each device (thread) its own,
+e.g. via spawn().
+"""
+
+import random
+from itertools import chain
+from typing import Iterator, Optional, Sequence, TypeVar
+
+try:
+    import numpy as np
+except ImportError:  # optional, see module docstring
+    np = None
+
+
+T = TypeVar("T")
+
+DEFAULT_BLOCK_SIZE = 4096
+
+
+class BatchedRNG:
+    """Drop-in replacement for the `random` module functions the routines use."""
+
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        block_size: int = DEFAULT_BLOCK_SIZE,
+        spawn_key: Sequence[int] = (),
+    ):
+        if np is None:
+            raise ImportError("BatchedRNG needs NumPy (pip install numpy); use new_rng() to fall back")
+        self._seed_seq = np.random.SeedSequence(seed, spawn_key=tuple(spawn_key))
+        self._gen = np.random.Generator(np.random.PCG64(self._seed_seq))
+        self._block_size = block_size
+
+        # random() is the C-level __next__ of a flat iterator over lazily
+        # drawn blocks, so a draw costs no Python frame; the generator
+        # only runs again when a block is used up.
+        self.random = chain.from_iterable(self._blocks()).__next__
+
+    @property
+    def seed(self) -> int:
+        """
+        Root entropy the stream was seeded from. Shared by spawned
+        children; replay needs spawn_key as well.
+        """
+        return self._seed_seq.entropy
+
+    @property
+    def spawn_key(self) -> tuple[int, ...]:
+        """Position in the spawn tree; () for a root stream."""
+        return self._seed_seq.spawn_key
+
+    def spawn(self, count: int) -> list["BatchedRNG"]:
+        """Independent child streams, e.g. one per device."""
+        return [
+            BatchedRNG(self.seed, block_size=self._block_size, spawn_key=child.spawn_key)
+            for child in self._seed_seq.spawn(count)
+        ]
+
+    def _blocks(self) -> Iterator[list[float]]:
+        # tolist() so draws are plain floats, not NumPy scalars.
+        while True:
+            yield self._gen.random(self._block_size).tolist()
+
+    # ---------- `random`-compatible API ----------
+
+    # random() -> float in [0.0, 1.0) is bound per instance in __init__.
+
+    def uniform(self, a: float, b: float) -> float:
+        """Float between a and b."""
+        return a + (b - a) * self.random()
+
+    def randint(self, a: int, b: int) -> int:
+        """Integer in [a, b], both ends included (like random.randint)."""
+        if b < a:
+            raise ValueError(f"empty range for randint({a}, {b})")
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq: Sequence[T]) -> T:
+        """Random element of a non-empty sequence."""
+        if not seq:
+            raise IndexError("Cannot choose from an empty sequence")
+        return seq[int(self.random() * len(seq))]
+
+    def shuffle(self, x: list) -> None:
+        """Shuffle list `x` in place (Fisher-Yates)."""
+        for i in range(len(x) - 1, 0, -1):
+            j = int(self.random() * (i + 1))
+            x[i], x[j] = x[j], x[i]
+
+
+
+class SimpleRNG:
+    """
+    BatchedRNG stand-in on random.Random, for when NumPy is missing.
+
+    Same seed / spawn_key / spawn() contract, so schedules stay
+    replayable; the draws themselves differ from BatchedRNG's.
+    """
+
+    def __init__(self, seed: Optional[int] = None, spawn_key: Sequence[int] = ()):
+        self._seed = seed if seed is not None else random.SystemRandom().getrandbits(128)
+        self._spawn_key = tuple(spawn_key)
+        self._spawned = 0
+
+        gen = random.Random(f"{self._seed}/{self._spawn_key}")
+        self.random = gen.random
+        self.uniform = gen.uniform
+        self.randint = gen.randint
+        self.choice = gen.choice
+        self.shuffle = gen.shuffle
+
+    @property
+    def seed(self) -> int:
+        """Root seed, shared by spawned children (see BatchedRNG.seed)."""
+        return self._seed
+
+    @property
+    def spawn_key(self) -> tuple[int, ...]:
+        return self._spawn_key
+
+    def spawn(self, count: int) -> list["SimpleRNG"]:
+        """Independent child streams, e.g. one per device."""
+        first, self._spawned = self._spawned, self._spawned + count
+        return [SimpleRNG(self._seed, self._spawn_key + (i,)) for i in range(first, first + count)]
+
+
+def new_rng(seed: Optional[int] = None, spawn_key: Sequence[int] = ()):
+    """A BatchedRNG, or a SimpleRNG if NumPy is not installed."""
+    if np is None:
+        return SimpleRNG(seed, spawn_key)
+    return BatchedRNG(seed, spawn_key=spawn_key)
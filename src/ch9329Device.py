@@ -0,0 +1,665 @@
+"""
+ch9329Device.py
+
+Thread-safe wrapper around the CP2102 serial link to a CH9329.
+
+The helpers in inputEvent take a bare serial.Serial and do a separate
+write() and flush() per frame. When several threads share one port
+(e.g. a keyboard thread and a mouse thread), their bytes can interleave
+mid-frame and the chip drops both frames.
+
+CH9329Device owns the port and funnels everything through a single
+writer thread fed by a queue:
+  - every frame is queued as one bytes object and written whole,
+  - frames that are already waiting are coalesced into one write(),
+  - request/response commands (parameter block, info) run as jobs on
+    the writer thread so nobody else touches the port in between.
+
+After calibrate(), the writer also paces frames to the rate the chip
+actually sustains and producers block once the queue holds more than
+the pacer's depth (see linkPacing), so the host write buffer does not
+grow into seconds of latency at low baud rates. When queueing latency
+drifts, the writer re-calibrates between batches; a failed attempt
+keeps the old pacing and is counted in stats["recalibration_failures"]
+with the exception in `recalibration_error`.
+
+If the CP2102 re-enumerates or the chip resets, the writer recovers on
+its own instead of raising out of every helper: it waits (bounded by
+`reconnect_timeout`) for the port to come back under /dev/ttyUSB*,
+reopens it with the same settings, resynchronizes the byte stream,
+retries the failed write, sends release-all reports and then carries
+on with the queued frames. Write timeouts (a backed-up link) are
+raised to the caller instead.
+
+While a HostStatusMonitor (see hostStatus) reports the target PC as
+not connected, pure motion frames are dropped and discrete events
+(keyboard reports, button changes, wheel) are held back in order and
+released when the host returns.
+
+Pass an eventLog.EventLog as `event_log` to record every frame that
+reaches the wire in a fixed-size ring buffer, stamped with the time it
+was submitted. The writer then also reads the chip's replies between
+batches (and waits for outstanding ones before a request/response
+job takes over the port) and stores each frame's ack status; frames
+whose ack never came stay ACK_UNKNOWN.
+
+Because the device exposes write() and flush(), it can also be handed
+to any existing helper or routine that expects a serial.Serial.
+"""
+
+from __future__ import annotations
+
+import glob
+import os
+import queue
+from collections import deque
+import random
+import threading
+import time
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+import inputEvent
+from inputEvent import open_serial
+from inputEvent import CMD_SEND_MS_REL_DATA, FrameParser
+from inputBitmasks import MOD_NONE
+from eventLog import ACK_UNKNOWN
+from linkPacing import LinkPacer, calibrate_link
+
+if TYPE_CHECKING:
+    import serial
+
+
+# Max frames coalesced into a single write() by the writer thread.
+MAX_BATCH_FRAMES = 64
+
+# Where a re-enumerated CP2102 shows up again on Linux.
+USB_SERIAL_GLOB = "/dev/ttyUSB*"
+
+# Poll interval while waiting for the port to come back.
+RECONNECT_POLL_S = 0.05
+
+# Logged frames waiting for their ack; older ones are given up on.
+MAX_AWAITING_ACKS = 4096
+
+_STOP = object()
+
+
+def _is_write_timeout(exc: BaseException) -> bool:
+    try:
+        import serial
+    except ImportError:
+        return False
+    return isinstance(exc, serial.SerialTimeoutException)
+
+
+class CH9329Device:
+    """
+    A CH9329 behind a serial port, safe to drive from many threads.
+
+    Example:
+        with CH9329Device.open("/dev/ttyUSB0") as dev:
+            dev.mouse_move(10, 0)
+            dev.key_tap(KEY_A)
+    """
+
+    def __init__(self, ser, reconnect_timeout: float = 10.0, event_log=None):
+        self._ser = ser
+        self.reconnect_timeout = reconnect_timeout
+        self.event_log = event_log
+        self._awaiting_ack: "deque[tuple[int, int]]" = deque(maxlen=MAX_AWAITING_ACKS)  # (seq, cmd)
+        self._ack_parser = FrameParser()
+
+        # Remembered so the port can be reopened identically after a
+        # disconnect (None for objects that aren't a serial.Serial).
+        self._port = getattr(ser, "port", None)
+        self._settings = ser.get_settings() if hasattr(ser, "get_settings") else None
+        # USB serial ports present while we hold ours; after a drop, a
+        # port outside this set is taken as ours re-enumerated.
+        self._known_ports = set(glob.glob(USB_SERIAL_GLOB))
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._local = threading.local()
+        self._closed = False
+
+        # Pacing (None until calibrate() is called)
+        self.pacer: Optional[LinkPacer] = None
+        self._depth = threading.Condition()
+        self._inflight = 0
+        self._next_write = 0.0
+        self._recalibrate = False
+        self.recalibration_error: Optional[Exception] = None  # last failed re-calibration
+
+        # Host USB gating (driven by hostStatus.HostStatusMonitor)
+        self._gate = threading.Lock()
+        self._host_connected = True
+        self._held: "deque[tuple[bytes, Future, float]]" = deque()
+        self._last_buttons = 0x00
+
+        self.stats = {
+            "frames_written": 0,
+            "bytes_written": 0,
+            "batches": 0,
+            "jobs": 0,
+            "recalibrations": 0,
+            "recalibration_failures": 0,
+            "reconnects": 0,
+            "reconnect_failures": 0,
+            "write_timeouts": 0,
+            "last_reconnect_s": 0.0,
+            "max_reconnect_s": 0.0,
+            "total_reconnect_s": 0.0,
+            "dropped_motion": 0,
+            "held_while_disconnected": 0,
+        }
+
+        self._writer = threading.Thread(
+            target=self._writer_loop,
+            name="ch9329-writer",
+            daemon=True,
+        )
+        self._writer.start()
+
+    @classmethod
+    def open(
+        cls,
+        port: str,
+        baudrate: int = 9600,
+        timeout: float = 0.2,
+        reconnect_timeout: float = 10.0,
+        event_log=None,
+    ) -> "CH9329Device":
+        """Open `port` with open_serial() and wrap it."""
+        return cls(open_serial(port, baudrate=baudrate, timeout=timeout), reconnect_timeout, event_log)
+
+    # ---------- Queue submission ----------
+
+    def submit(self, frame: bytes) -> Future:
+        """
+        Queue one complete frame for the writer thread.
+
+        Returns a Future that resolves once the frame has been written
+        and flushed to the port.
+        """
+        if self._closed:
+            raise RuntimeError("CH9329Device is closed")
+
+        frame = bytes(frame)
+        fut: Future = Future()
+
+        with self._depth:
+            pacer = self.pacer
+            while pacer is not None and pacer.max_depth and self._inflight >= pacer.max_depth:
+                self._depth.wait()
+            self._inflight += 1
+
+        # Queue under the gate so frames can't overtake held ones that
+        # set_host_connected() is releasing.
+        with self._gate:
+            if self._closed:
+                self._release(1)
+                raise RuntimeError("CH9329Device is closed")
+            self._local.last = fut
+
+            motion_only = self._is_motion_only(frame)
+            if not self._host_connected:
+                self._release(1)
+                if motion_only:
+                    self.stats["dropped_motion"] += 1
+                    fut.set_result(None)
+                else:
+                    self.stats["held_while_disconnected"] += 1
+                    self._held.append((frame, fut, time.perf_counter()))
+                return fut
+
+            self._queue.put((frame, fut, time.perf_counter()))
+        return fut
+
+    def call(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(ser, *args, **kwargs) on the writer thread with exclusive
+        access to the port, and return its result.
+
+        Use this for request/response commands such as
+        inputEvent._get_parameter_block.
+        """
+        fut: Future = Future()
+        self._enqueue((lambda ser: func(ser, *args, **kwargs), fut, time.perf_counter()))
+        return fut.result()
+
+    def _enqueue(self, item) -> None:
+        # Checked under the gate that close() also takes, so nothing can
+        # land behind _STOP and wait forever.
+        with self._gate:
+            if self._closed:
+                raise RuntimeError("CH9329Device is closed")
+            self._queue.put(item)
+
+    def set_host_connected(self, connected: bool) -> None:
+        """
+        Called by HostStatusMonitor. While False, motion is dropped and
+        discrete events are held; switching back to True queues the held
+        events in their original order.
+        """
+        with self._gate:
+            was_connected = self._host_connected
+            self._host_connected = connected
+            if connected and not was_connected:
+                with self._depth:
+                    self._inflight += len(self._held)
+                while self._held:
+                    self._queue.put(self._held.popleft())
+
+    def _is_motion_only(self, frame: bytes) -> bool:
+        """
+        True for a relative mouse frame that only moves: no wheel and no
+        change of button state since the previous mouse frame. Also
+        tracks that button state, so call it for every submitted frame.
+        """
+        if len(frame) != 11 or frame[3] != CMD_SEND_MS_REL_DATA:
+            return False
+        buttons, wheel = frame[6], frame[9]
+        unchanged = buttons == self._last_buttons
+        self._last_buttons = buttons
+        return unchanged and wheel == 0x00
+
+    def pending(self) -> int:
+        """Approximate number of frames/jobs waiting for the writer."""
+        return self._queue.qsize()
+
+    # ---------- serial.Serial compatibility ----------
+
+    def write(self, data: bytes) -> int:
+        """
+        Queue `data` as a single frame.
+
+        The inputEvent helpers always write one whole frame per call,
+        so this keeps each of them atomic.
+        """
+        self.submit(data)
+        return len(data)
+
+    def flush(self) -> None:
+        """Wait until the last frame queued by this thread is on the wire."""
+        fut = getattr(self._local, "last", None)
+        if fut is not None:
+            self._local.last = None
+            fut.result()
+
+    def drain(self) -> None:
+        """Wait until everything queued so far (from any thread) is written."""
+        fut: Future = Future()
+        self._enqueue((lambda ser: None, fut, time.perf_counter()))
+        fut.result()
+
+    def calibrate(self, pacer: Optional[LinkPacer] = None) -> LinkPacer:
+        """
+        Measure the link with calibrate_link() and start pacing frames.
+
+        Pass a LinkPacer to change the target latency / drift settings;
+        otherwise a default one is used. Returns the active pacer.
+        """
+        pacer = pacer or self.pacer or LinkPacer()
+        pacer.retune(self.call(calibrate_link, buttons=self._last_buttons))
+        with self._depth:
+            self.pacer = pacer
+            self._depth.notify_all()
+        return pacer
+
+    def close(self) -> None:
+        """Stop the writer thread after it drains the queue, then close the port."""
+        with self._gate:
+            if self._closed:
+                return
+            self._closed = True
+            # Events held for a disconnected host will never be sent.
+            while self._held:
+                _frame, fut, _queued_at = self._held.popleft()
+                fut.set_exception(RuntimeError("CH9329Device closed while host was disconnected"))
+            self._queue.put(_STOP)
+        self._writer.join()
+        self._ser.close()
+
+    def __enter__(self) -> "CH9329Device":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    # ---------- Writer thread ----------
+
+    def _writer_loop(self) -> None:
+        carry = None
+        while True:
+            item = carry if carry is not None else self._queue.get()
+            carry = None
+            if item is _STOP:
+                self._collect_acks(block=True)
+                return
+
+            payload, fut, queued_at = item
+            if callable(payload):
+                # The job owns the port's input from here on, so settle
+                # outstanding acks first (only waits if logging).
+                self._collect_acks(block=True)
+                self._awaiting_ack.clear()
+                self._run_job(payload, fut)
+                continue
+
+            # Coalesce frames that are already waiting into one write.
+            pacer = self.pacer
+            limit = MAX_BATCH_FRAMES
+            if pacer is not None and pacer.max_depth:
+                limit = min(limit, pacer.max_depth)
+
+            frames = [payload]
+            futures = [fut]
+            stamps = [queued_at]
+            while len(frames) < limit:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP or callable(nxt[0]):
+                    carry = nxt
+                    break
+                frames.append(nxt[0])
+                futures.append(nxt[1])
+                stamps.append(nxt[2])
+
+            self._write_batch(frames, futures, stamps)
+            self._collect_acks()
+
+            if self._recalibrate:
+                self._recalibrate = False
+                self._retune(pacer)
+
+    def _write_batch(self, frames: list[bytes], futures: list[Future], stamps: list[float]) -> None:
+        pacer = self.pacer
+        if pacer is not None:
+            delay = self._next_write - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        data = b"".join(frames)
+
+        def write_data(ser) -> None:
+            ser.write(data)
+            ser.flush()
+
+        started = time.perf_counter()
+        try:
+            self._with_recovery(write_data)
+        except Exception as exc:
+            self._release(len(frames))
+            for fut in futures:
+                fut.set_exception(exc)
+            return
+
+        now = time.perf_counter()
+        if pacer is not None:
+            # Interval counts from the start of this write, since flush()
+            # already waited for the bytes to leave the host.
+            self._next_write = started + len(frames) * pacer.frame_interval
+            if pacer.observe(now - stamps[0]):
+                self._recalibrate = True
+
+        if self.event_log is not None:
+            self._log_frames(frames, stamps)
+
+        self._release(len(frames))
+        self.stats["frames_written"] += len(frames)
+        self.stats["bytes_written"] += len(data)
+        self.stats["batches"] += 1
+        for fut in futures:
+            fut.set_result(None)
+
+    # ---------- Event log ----------
+
+    def _log_frames(self, frames: list[bytes], stamps: list[float]) -> None:
+        """Record each frame with its own submit time (on the time.time() clock)."""
+        to_wall = time.time() - time.perf_counter()
+        for frame, stamp in zip(frames, stamps):
+            cmd = frame[3]
+            seq = self.event_log.append(cmd, frame[5:-1], to_wall + stamp)
+            self._awaiting_ack.append((seq, cmd))
+
+    def _collect_acks(self, block: bool = False) -> None:
+        """
+        Read replies that have arrived and store their status on the
+        logged frames, matching by command in send order. With `block`,
+        wait (up to the port's read timeout) for all outstanding acks.
+        """
+        ser = self._ser
+        if not hasattr(ser, "read"):
+            self._awaiting_ack.clear()
+            return
+        while self._awaiting_ack:
+            waiting = getattr(ser, "in_waiting", 0)
+            if not waiting and not block:
+                return
+            try:
+                chunk = ser.read(waiting or 1)
+            except OSError:
+                return
+            if not chunk:
+                return
+            for _addr, cmd, data in self._ack_parser.feed(chunk):
+                self._match_ack(cmd & 0x7F, data[0] if data else ACK_UNKNOWN)
+
+    def _match_ack(self, cmd: int, status: int) -> None:
+        # Frames before the match lost their ack; they stay ACK_UNKNOWN.
+        while self._awaiting_ack:
+            seq, sent = self._awaiting_ack.popleft()
+            if sent == cmd:
+                self.event_log.set_ack(seq, status)
+                return
+
+    def _retune(self, pacer: LinkPacer) -> None:
+        """Re-calibrate after latency drift (writer thread only)."""
+        buttons = self._last_buttons
+        try:
+            pacer.retune(self._with_recovery(lambda ser: calibrate_link(ser, buttons=buttons)))
+        except (RuntimeError, OSError) as exc:
+            self.recalibration_error = exc
+            self.stats["recalibration_failures"] += 1
+            # Keep the old pacing and let drift build up again before
+            # the next attempt, rather than retrying after every batch.
+            pacer.observed_latency = pacer.calibration.latency_s
+            return
+        self.recalibration_error = None
+        self.stats["recalibrations"] += 1
+
+    def _release(self, count: int) -> None:
+        with self._depth:
+            self._inflight -= count
+            self._depth.notify_all()
+
+    def _run_job(self, job: Callable[[Any], Any], fut: Future) -> None:
+        try:
+            result = self._with_recovery(job)
+        except Exception as exc:
+            fut.set_exception(exc)
+            return
+        self.stats["jobs"] += 1
+        fut.set_result(result)
+
+    # ---------- Reconnect ----------
+
+    def _with_recovery(self, op: Callable[[Any], Any]) -> Any:
+        """
+        Run op(ser); on a serial I/O error, reconnect once and retry.
+
+        A write timeout means the link is backed up, not that the port
+        is gone, so it is raised as-is instead of reopening the port.
+        """
+        try:
+            return op(self._ser)
+        except OSError as exc:  # serial.SerialException is an OSError
+            if _is_write_timeout(exc):
+                self.stats["write_timeouts"] += 1
+                raise
+            if not self._recover():
+                raise
+        try:
+            return op(self._ser)
+        finally:
+            # Only after the retry: a press in the retried batch must not
+            # outlive the release-all.
+            self._release_after_reconnect()
+
+    def _recover(self) -> bool:
+        """
+        Reopen the port after a disconnect. Returns False if there is
+        nothing to reopen or it did not come back within
+        `reconnect_timeout`.
+        """
+        if self._port is None or self._settings is None:
+            return False
+
+        started = time.monotonic()
+        deadline = started + self.reconnect_timeout
+
+        try:
+            self._ser.close()
+        except Exception:
+            pass
+
+        while time.monotonic() < deadline:
+            ser = self._reopen(self._known_ports)
+            if ser is not None:
+                try:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    if inputEvent._resync_stream(ser, timeout=min(0.5, remaining)):
+                        self._ser = ser
+                        self._awaiting_ack.clear()
+                        self._ack_parser = FrameParser()
+                        self._known_ports = set(glob.glob(USB_SERIAL_GLOB))
+                        self._next_write = 0.0
+                        self._record_reconnect(time.monotonic() - started)
+                        return True
+                except OSError:
+                    pass
+                ser.close()
+            time.sleep(RECONNECT_POLL_S)
+
+        self.stats["reconnect_failures"] += 1
+        return False
+
+    def _release_after_reconnect(self) -> None:
+        """Release every key and button on the host and tell the mouse engine."""
+        try:
+            inputEvent.release_all(self._ser)
+        except OSError:
+            pass  # the port is gone again; the next write will notice
+        self._last_buttons = 0x00
+        inputEvent._sync_mouse_state(self, 0x00, reset=True)
+
+    def _reopen(self, known: set[str]) -> Optional[serial.Serial]:
+        import serial
+
+        candidates = []
+        if os.path.exists(self._port) or not self._port.startswith("/dev/"):
+            candidates.append(self._port)
+        else:
+            new = sorted(set(glob.glob(USB_SERIAL_GLOB)) - known)
+            if len(new) == 1:
+                candidates.append(new[0])
+
+        for port in candidates:
+            ser = serial.Serial()
+            ser.port = port
+            ser.apply_settings(self._settings)
+            try:
+                ser.open()
+            except OSError:
+                continue
+            self._port = port
+            return ser
+        return None
+
+    def _record_reconnect(self, elapsed: float) -> None:
+        self.stats["reconnects"] += 1
+        self.stats["last_reconnect_s"] = elapsed
+        self.stats["total_reconnect_s"] += elapsed
+        self.stats["max_reconnect_s"] = max(self.stats["max_reconnect_s"], elapsed)
+
+    # ---------- Config helpers ----------
+
+    def get_parameter_block(self) -> list[int]:
+        """Read the 50-byte parameter block (CMD_GET_PARA_CFG)."""
+        return self.call(inputEvent._get_parameter_block)
+
+    def set_parameter_block(self, params: list[int]) -> None:
+        """Write the 50-byte parameter block (CMD_SET_PARA_CFG)."""
+        self.call(inputEvent._set_parameter_block, params)
+
+    def set_baudrate_115200(self) -> None:
+        """See inputEvent.set_baudrate_115200."""
+        self.call(inputEvent.set_baudrate_115200)
+
+    # ---------- Keyboard helpers ----------
+
+    def send_keyboard_report(self, keycodes: list[int], modifiers: int = MOD_NONE) -> None:
+        inputEvent.send_keyboard_report(self, keycodes, modifiers)
+
+    def key_down(self, keycode: int, modifiers: int = MOD_NONE) -> None:
+        inputEvent.key_down(self, keycode, modifiers)
+
+    def key_up(self) -> None:
+        inputEvent.key_up(self)
+
+    def key_tap(self, keycode: int, modifiers: int = MOD_NONE, delay: float = 0.03, rng=random) -> None:
+        inputEvent.key_tap(self, keycode, modifiers, delay, rng=rng)
+
+    # ---------- Mouse helpers ----------
+
+    def mouse_move(self, dx: int, dy: int, buttons: int = 0x00, wheel: int = 0x00) -> None:
+        inputEvent.mouse_move(self, dx, dy, buttons, wheel)
+
+    def mouse_down(self, button_mask: int) -> None:
+        inputEvent.mouse_down(self, button_mask)
+
+    def mouse_up(self) -> None:
+        inputEvent.mouse_up(self)
+
+    def release_all(self) -> None:
+        inputEvent.release_all(self)
+
+
+# ---------- Benchmark ----------
+
+def benchmark_producers(
+    dev: CH9329Device,
+    thread_counts: tuple[int, ...] = (1, 4, 16),
+    frames_per_thread: int = 500,
+) -> dict[int, float]:
+    """
+    Measure frame throughput (frames/s) with N producer threads each
+    calling dev.mouse_move() `frames_per_thread` times.
+
+    Zero-length moves are used so the cursor does not wander. Returns
+    {thread_count: frames_per_second}.
+    """
+    results: dict[int, float] = {}
+
+    def producer(barrier: threading.Barrier) -> None:
+        barrier.wait()
+        for _ in range(frames_per_thread):
+            dev.mouse_move(0, 0)
+
+    for n in thread_counts:
+        barrier = threading.Barrier(n + 1)
+        threads = [threading.Thread(target=producer, args=(barrier,)) for _ in range(n)]
+        for t in threads:
+            t.start()
+
+        barrier.wait()
+        start = time.perf_counter()
+        for t in threads:
+            t.join()
+        dev.drain()
+        elapsed = time.perf_counter() - start
+
+        results[n] = (n * frames_per_thread) / elapsed if elapsed > 0 else float("inf")
+
+    return results
@@ -3,7 +3,8 @@ import random
 import time
 from typing import Callable, Dict, Optional
 
-from inputEvent import key_tap, mouse_move, mouse_down, mouse_up
+from inputEvent import key_tap, mouse_state, release_all
+from routineScheduler import RoutineScheduler
 from inputBitmasks import (
     MOD_NONE,
     MOD_LCTRL,
@@ -75,19 +76,23 @@ DEFAULT_SEARCH_QUERIES = [
 
 
 
-def _human_pause(min_s: float = 0.05, max_s: float = 0.30) -> None:
+def _human_pause(min_s: float = 0.05, max_s: float = 0.30, rng=random) -> None:
     
-    time.sleep(random.uniform(min_s, max_s))
+    time.sleep(rng.uniform(min_s, max_s))
 
 
-def _left_click(ser) -> None:
+def _left_click(ser, rng=random) -> None:
 
-    mouse_down(ser, MOUSE_LEFT)
-    _human_pause(0.05, 0.18)
-    mouse_up(ser)
+    # A click, not a drag: send the press now instead of folding it
+    # into whatever move comes next. Anything pending rides along.
+    mouse = mouse_state(ser)
+    mouse.press(MOUSE_LEFT)
+    mouse.flush()
+    _human_pause(0.05, 0.18, rng=rng)
+    mouse.release(MOUSE_LEFT)
 
 
-def type_text(ser, text: str, base_delay: float = 0.07) -> None:
+def type_text(ser, text: str, base_delay: float = 0.07, rng=random) -> None:
 
     for ch in text.lower():
         mapping = CHAR_KEYMAP.get(ch)
@@ -97,34 +102,34 @@ def type_text(ser, text: str, base_delay: float = 0.07) -> None:
         keycode, modifiers = mapping
 
         # Per-character dwell time variation
-        dwell = base_delay * random.uniform(0.6, 1.6)
-        key_tap(ser, keycode, modifiers, delay=dwell)
+        dwell = base_delay * rng.uniform(0.6, 1.6)
+        key_tap(ser, keycode, modifiers, delay=dwell, rng=rng)
 
         # Gap before next key
-        _human_pause(0.03, 0.20)
+        _human_pause(0.03, 0.20, rng=rng)
 
         # Slightly longer pause at spaces sometimes (thinking)
-        if ch == " " and random.random() < 0.3:
-            _human_pause(0.15, 0.40)
+        if ch == " " and rng.random() < 0.3:
+            _human_pause(0.15, 0.40, rng=rng)
 
 
-def _random_mouse_move(ser) -> None:
+def _random_mouse_move(ser, rng=random) -> None:
 
- 
-    duration = random.uniform(1.0, 3.0)
+    mouse = mouse_state(ser)
+    duration = rng.uniform(1.0, 3.0)
     start_time = time.time()
     end_time = start_time + duration
 
     #Initial direction
-    angle = random.uniform(0, 2 * math.pi)
+    angle = rng.uniform(0, 2 * math.pi)
 
     #Base step length
-    base_step_len = random.uniform(7.0, 16.0)
+    base_step_len = rng.uniform(7.0, 16.0)
 
     #Initial curvature
-    curvature = random.uniform(-0.08, 0.08)
+    curvature = rng.uniform(-0.08, 0.08)
     if abs(curvature) < 0.02:
-        curvature = math.copysign(0.02, curvature or (1 if random.random() < 0.5 else -1))
+        curvature = math.copysign(0.02, curvature or (1 if rng.random() < 0.5 else -1))
 
     while True:
         now = time.time()
@@ -143,19 +148,19 @@ def _random_mouse_move(ser) -> None:
         step_len = base_step_len * speed_scale
 
        
-        if random.random() < 0.03:
-            curvature = random.uniform(-0.09, 0.09)
+        if rng.random() < 0.03:
+            curvature = rng.uniform(-0.09, 0.09)
             if abs(curvature) < 0.02:
-                curvature = math.copysign(0.02, curvature or (1 if random.random() < 0.5 else -1))
-        if random.random() < 0.03:
-            base_step_len = random.uniform(7.0, 18.0)
+                curvature = math.copysign(0.02, curvature or (1 if rng.random() < 0.5 else -1))
+        if rng.random() < 0.03:
+            base_step_len = rng.uniform(7.0, 18.0)
 
         
         angle += curvature
 
       
-        jitter_dx = random.uniform(-0.4, 0.4)
-        jitter_dy = random.uniform(-0.4, 0.4)
+        jitter_dx = rng.uniform(-0.4, 0.4)
+        jitter_dy = rng.uniform(-0.4, 0.4)
 
         dx_f = step_len * math.cos(angle) + jitter_dx
         dy_f = step_len * math.sin(angle) + jitter_dy
@@ -164,55 +169,66 @@ def _random_mouse_move(ser) -> None:
         dy = int(round(dy_f))
 
         if dx != 0 and dy != 0:
-            mouse_move(ser, dx, dy)
+            mouse.move(dx, dy)
 
        
-        dt = random.uniform(0.0005, 0.0025)
+        dt = rng.uniform(0.0005, 0.0025)
         time.sleep(dt)
 
-    _human_pause(0.01, 0.06)
+    mouse.flush()
+    _human_pause(0.01, 0.06, rng=rng)
 
 
-def _scroll_burst(ser) -> None:
-    lines = random.randint(1, 4)
+def _scroll_burst(ser, rng=random) -> None:
+    # Each line is its own frame, except the last, which is left pending
+    # to ride on the caller's next move (callers follow with a motion
+    # helper, which flushes it in any case).
+    mouse = mouse_state(ser)
+    lines = rng.randint(1, 4)
    
-    direction = -1 if random.random() < 0.75 else 1
+    direction = -1 if rng.random() < 0.75 else 1
 
-    for _ in range(lines):
-        wheel_delta = direction * random.randint(1, 3)
-        mouse_move(ser, 0, 0, wheel=wheel_delta)
-        _human_pause(0.01, 0.06)
+    for i in range(lines):
+        wheel_delta = direction * rng.randint(1, 3)
+        mouse.wheel(wheel_delta)
+        if i < lines - 1:
+            mouse.flush()
+            _human_pause(0.01, 0.06, rng=rng)
 
 
-def _move_far_up_right(ser) -> None:
+def _move_far_up_right(ser, rng=random) -> None:
 
-    duration = random.uniform(0.6, 1.2)
+    mouse = mouse_state(ser)
+    duration = rng.uniform(0.6, 1.2)
     end_time = time.time() + duration
 
     while time.time() < end_time:
         
-        dx = random.randint(10, 20)
-        dy = -random.randint(8, 18)
-        mouse_move(ser, dx, dy)
+        dx = rng.randint(10, 20)
+        dy = -rng.randint(8, 18)
+        mouse.move(dx, dy)
+
+        time.sleep(rng.uniform(0.0008, 0.003))
 
-        time.sleep(random.uniform(0.0008, 0.003))
+    mouse.flush()
 
-def _local_wander_move(ser) -> None:
+def _local_wander_move(ser, rng=random) -> None:
 
-    duration = random.uniform(0.4, 1.2)
+    mouse = mouse_state(ser)
+    duration = rng.uniform(0.4, 1.2)
     end_time = time.time() + duration
 
     
-    angle = random.uniform(0, 2 * math.pi)
+    angle = rng.uniform(0, 2 * math.pi)
 
     while time.time() < end_time:
         
-        angle += random.uniform(-0.7, 0.7)
+        angle += rng.uniform(-0.7, 0.7)
 
-        step_len = random.uniform(2.0, 8.0)
+        step_len = rng.uniform(2.0, 8.0)
 
-        jitter_dx = random.uniform(-0.4, 0.4)
-        jitter_dy = random.uniform(-0.4, 0.4)
+        jitter_dx = rng.uniform(-0.4, 0.4)
+        jitter_dy = rng.uniform(-0.4, 0.4)
 
         dx_f = step_len * math.cos(angle) + jitter_dx
         dy_f = step_len * math.sin(angle) + jitter_dy
@@ -221,76 +237,79 @@ def _local_wander_move(ser) -> None:
         dy = int(round(dy_f))
 
         if dx != 0 or dy != 0:
-            mouse_move(ser, dx, dy)
+            mouse.move(dx, dy)
 
-        time.sleep(random.uniform(0.0008, 0.003))
+        time.sleep(rng.uniform(0.0008, 0.003))
 
-    _human_pause(0.01, 0.06)
+    mouse.flush()
+    _human_pause(0.01, 0.06, rng=rng)
 
 
-def routine_1_random_mouse_moves(ser) -> None:
+def routine_1_random_mouse_moves(ser, rng=random) -> None:
     # 1–5 fast movements, each 1–3 seconds
-    moves = random.randint(1, 5)
+    moves = rng.randint(1, 5)
     for _ in range(moves):
-        _random_mouse_move(ser)
-        _human_pause(0.02, 0.12)
+        _random_mouse_move(ser, rng=rng)
+        _human_pause(0.02, 0.12, rng=rng)
 
 
-def routine_2_random_mouse_moves_with_clicks(ser) -> None:
+def routine_2_random_mouse_moves_with_clicks(ser, rng=random) -> None:
 
    
-    _move_far_up_right(ser)
-    _human_pause(0.02, 0.10)
+    _move_far_up_right(ser, rng=rng)
+    _human_pause(0.02, 0.10, rng=rng)
 
    
-    inner_moves = random.randint(1, 5)
+    inner_moves = rng.randint(1, 5)
     for _ in range(inner_moves):
-        _local_wander_move(ser)
+        _local_wander_move(ser, rng=rng)
 
-        if random.random() < 0.7:
-            _left_click(ser)
-            _human_pause(0.02, 0.10)
+        if rng.random() < 0.7:
+            _left_click(ser, rng=rng)
+            _human_pause(0.02, 0.10, rng=rng)
 
-        _human_pause(0.01, 0.08)
+        _human_pause(0.01, 0.08, rng=rng)
 
 
 
-def routine_3_random_mouse_moves_with_scrolls(ser) -> None:
-    moves = random.randint(1, 5)
+def routine_3_random_mouse_moves_with_scrolls(ser, rng=random) -> None:
+    moves = rng.randint(1, 5)
     for _ in range(moves):
-        _scroll_burst(ser)
-        _random_mouse_move(ser)
-        _human_pause(0.02, 0.12)
+        _scroll_burst(ser, rng=rng)
+        _random_mouse_move(ser, rng=rng)
+        _human_pause(0.02, 0.12, rng=rng)
 
 
-def routine_4_random_mouse_moves_with_scrolls_and_final_click(ser) -> None:
-    routine_3_random_mouse_moves_with_scrolls(ser)
-    _human_pause(0.03, 0.15)
-    _left_click(ser)
+def routine_4_random_mouse_moves_with_scrolls_and_final_click(ser, rng=random) -> None:
+    routine_3_random_mouse_moves_with_scrolls(ser, rng=rng)
+    _human_pause(0.03, 0.15, rng=rng)
+    _left_click(ser, rng=rng)
 
 
 def routine_5_open_google_tab_and_search(
     ser,
     query: Optional[str] = None,
+    rng=random,
 ) -> None:
 
     if query is None:
-        query = random.choice(DEFAULT_SEARCH_QUERIES)
+        query = rng.choice(DEFAULT_SEARCH_QUERIES)
 
-    key_tap(ser, KEY_T, MOD_LCTRL)
-    time.sleep(random.uniform(0.4, 0.9))
+    key_tap(ser, KEY_T, MOD_LCTRL, rng=rng)
+    time.sleep(rng.uniform(0.4, 0.9))
 
-    type_text(ser, query, base_delay=0.07)
-    _human_pause(0.10, 0.40)
+    type_text(ser, query, base_delay=0.07, rng=rng)
+    _human_pause(0.10, 0.40, rng=rng)
 
-    key_tap(ser, KEY_ENTER, MOD_NONE)
-    time.sleep(random.uniform(1.0, 2.0))  
+    key_tap(ser, KEY_ENTER, MOD_NONE, rng=rng)
+    time.sleep(rng.uniform(1.0, 2.0))  
 
 
 def routine_6_alt_tab_cycle(
     ser,
     min_cycles: int = 2,
     max_cycles: int = 5,
+    rng=random,
 ) -> None:
  
     even_options = [n for n in range(min_cycles, max_cycles + 1) if n % 2 == 0]
@@ -299,70 +318,86 @@ def routine_6_alt_tab_cycle(
         
         cycles = max(2, min_cycles + (min_cycles % 2))
     else:
-        cycles = random.choice(even_options)
+        cycles = rng.choice(even_options)
 
-    _human_pause(0.10, 0.40)
+    _human_pause(0.10, 0.40, rng=rng)
     for _ in range(cycles):
         
-        key_tap(ser, KEY_TAB, MOD_LALT)
-        _human_pause(0.25, 0.90)
+        key_tap(ser, KEY_TAB, MOD_LALT, rng=rng)
+        _human_pause(0.25, 0.90, rng=rng)
 
 
 
-def routine_7_close_current_tab(ser) -> None:
+def routine_7_close_current_tab(ser, rng=random) -> None:
 
-    key_tap(ser, KEY_W, MOD_LCTRL)
-    _human_pause(0.05, 0.20)
+    key_tap(ser, KEY_W, MOD_LCTRL, rng=rng)
+    _human_pause(0.05, 0.20, rng=rng)
 
 
 
 ROUTINES: Dict[str, Callable[..., None]] = {
     "routine_1": routine_1_random_mouse_moves,
     "routine_2": routine_2_random_mouse_moves_with_clicks,
-    ##"routine_3": routine_3_random_mouse_moves_with_scrolls,
-    ##"routine_4": routine_4_random_mouse_moves_with_scrolls_and_final_click,
+    "routine_3": routine_3_random_mouse_moves_with_scrolls,
+    "routine_4": routine_4_random_mouse_moves_with_scrolls_and_final_click,
     "routine_5": routine_5_open_google_tab_and_search,
     "routine_6": routine_6_alt_tab_cycle,
     "routine_7": routine_7_close_current_tab,
 }
 
 
-def run_random_routine(ser) -> None:
-
-    while True:
-        
-        phase1_funcs = [
-            routine_1_random_mouse_moves,
-            routine_3_random_mouse_moves_with_scrolls,
-            routine_6_alt_tab_cycle,
-        ]
-        random.shuffle(phase1_funcs)
-
-        for func in phase1_funcs:
-            reps = random.randint(3, 5)
-            for _ in range(reps):
-                func(ser)
-                _human_pause(.5, 3)
-
-       
-        routine_5_open_google_tab_and_search(ser)
-
-       
-        phase3_funcs = [
-            routine_1_random_mouse_moves,
-            ##routine_2_random_mouse_moves_with_clicks,
-            routine_3_random_mouse_moves_with_scrolls,
-            ##routine_4_random_mouse_moves_with_scrolls_and_final_click,
-            routine_6_alt_tab_cycle,
-        ]
-        random.shuffle(phase3_funcs)
-
-        for func in phase3_funcs:
-            reps = random.randint(1, 2)
-            for _ in range(reps):
-                func(ser)
-                _human_pause(2, 5)
+# Plan for RoutineScheduler (see routineScheduler.py for the format).
+# Set a weight to 0 to switch a routine off.
+DEFAULT_PLAN = {
+    "loop": True,
+    "phases": [
+        {
+            "mode": "shuffle",
+            "reps": (3, 5),
+            "pause": (0.5, 3.0),
+            "routines": {"routine_1": 1, "routine_3": 1, "routine_6": 1},
+        },
+        {
+            "routines": {"routine_5": 1},
+        },
+        {
+            "mode": "shuffle",
+            "reps": (1, 2),
+            "pause": (2.0, 5.0),
+            "routines": {
+                "routine_1": 1,
+                "routine_2": 0,
+                "routine_3": 1,
+                "routine_4": 0,
+                "routine_6": 1,
+            },
+        },
+        {
+            "routines": {"routine_7": 1},
+        },
+    ],
+}
 
-       
-        routine_7_close_current_tab(ser)
 
+def run_random_routine(
+    ser,
+    plan: Optional[dict] = None,
+    seed: Optional[int] = None,
+) -> Dict[str, dict]:
+    """
+    Run `plan` (DEFAULT_PLAN if omitted) on `ser` until it finishes or
+    Ctrl+C is pressed, and return the per-routine stats.
+
+    Pass a different `seed` per device; the same seed replays the same
+    random draws.
+
+    For a run you can stop from another thread, use RoutineScheduler
+    directly (start() / stop()).
+    """
+    sched = RoutineScheduler(ser, plan or DEFAULT_PLAN, ROUTINES, seed=seed)
+    try:
+        sched.run()
+    except KeyboardInterrupt:
+        # Interrupted mid-routine: don't leave keys or buttons held down.
+        release_all(ser)
+    return sched.stats()
@@ -0,0 +1,338 @@
+"""
+cli.py
+
+Command-line front end.
+
+    python cli.py run      --port /dev/ttyUSB0 [routine_1 routine_6 ...]
+    python cli.py replay   --port /dev/ttyUSB0 trace.txt
+    python cli.py simulate [--baud 9600]
+    python cli.py bench    [--port /dev/ttyUSB0]
+    python cli.py config   --port /dev/ttyUSB0 get [field ...]
+    python cli.py config   --port /dev/ttyUSB0 set field=value [...]
+
+`run` with no routine names runs DEFAULT_PLAN (or --plan FILE, a JSON
+plan in the RoutineScheduler format). `--port sim` anywhere starts a
+VirtualCH9329 instead of opening hardware.
+
+`replay` takes either an EventLog snapshot (as written by
+`run --log FILE`) or a text trace, one frame per line:
+
+    <seconds since start> <frame as hex>
+    0.000 57ab00050501000a0a0021
+    # comments and blank lines are ignored
+
+pyserial, NumPy and the routine modules are only imported by the
+subcommands that need them, so `--help` and light subcommands start
+fast.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+
+# ---------- Shared helpers ----------
+
+def _open_device(args, event_log=None):
+    """Return (device, virtual_chip_or_None) for --port / --baud."""
+    from ch9329Device import CH9329Device
+
+    chip = None
+    port = args.port
+    if port == "sim":
+        from virtualChip import VirtualCH9329
+
+        chip = VirtualCH9329(baudrate=args.baud)
+        port = chip.start()
+
+    dev = CH9329Device.open(port, baudrate=args.baud, event_log=event_log)
+    return dev, chip
+
+
+def _close_device(dev, chip) -> None:
+    dev.close()
+    if chip is not None:
+        chip.stop()
+
+
+def _read_trace(path: str):
+    """Yield (seconds, frame) pairs from a snapshot or text trace (see module docstring)."""
+    from eventLog import EventLog, is_snapshot
+    from inputEvent import CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA, FrameParser, _build_frame
+
+    if is_snapshot(path):
+        first = None
+        for ts, cmd, payload, _ack in EventLog.load(path):
+            if cmd not in (CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA):
+                continue  # only keyboard/mouse reports are replayed
+            if first is None:
+                first = ts
+            yield ts - first, _build_frame(cmd, list(payload))
+        return
+
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            try:
+                t, hex_frame = line.split()
+                frame = bytes.fromhex(hex_frame)
+                t = float(t)
+            except ValueError:
+                raise ValueError(f"{path}:{lineno}: expected '<seconds> <hex frame>'") from None
+            if len(FrameParser().feed(frame)) != 1:
+                raise ValueError(f"{path}:{lineno}: not a single valid CH9329 frame")
+            yield t, frame
+
+
+# ---------- Subcommands ----------
+
+def cmd_run(args) -> int:
+    from chrome_routines import DEFAULT_PLAN, ROUTINES
+    from routineScheduler import RoutineScheduler
+
+    if args.routines and args.plan:
+        print("Give either routine names or --plan, not both", file=sys.stderr)
+        return 2
+    if args.routines:
+        unknown = [name for name in args.routines if name not in ROUTINES]
+        if unknown:
+            print(f"Unknown routine(s): {', '.join(unknown)}. Known: {', '.join(ROUTINES)}", file=sys.stderr)
+            return 2
+        plan = {
+            "loop": args.loop,
+            "phases": [
+                {"routines": {name: 1}, "pause": (args.pause, args.pause)}
+                for name in args.routines
+            ],
+        }
+    elif args.plan:
+        try:
+            with open(args.plan) as f:
+                plan = json.load(f)
+        except (OSError, ValueError) as exc:
+            print(f"Cannot read plan {args.plan}: {exc}", file=sys.stderr)
+            return 2
+    else:
+        plan = dict(DEFAULT_PLAN)
+
+    if args.budget is not None and isinstance(plan, dict):
+        plan["budget_s"] = args.budget
+
+    # Validate before touching the port, so a bad plan costs nothing.
+    try:
+        sched = RoutineScheduler(None, plan, ROUTINES, seed=args.seed)
+    except ValueError as exc:
+        print(f"Bad plan: {exc}", file=sys.stderr)
+        return 2
+
+    event_log = None
+    if args.log:
+        from eventLog import EventLog
+
+        event_log = EventLog(args.log_size)
+
+    dev, chip = _open_device(args, event_log)
+    monitor = None
+    try:
+        if args.calibrate:
+            print(f"Calibrated: {dev.calibrate().calibration}")
+        if args.monitor:
+            from hostStatus import HostStatusMonitor
+
+            monitor = HostStatusMonitor(dev)
+            monitor.start()
+
+        sched.ser = dev
+        print(f"Running (seed={sched.seed}); Ctrl+C to stop")
+        try:
+            sched.run()
+        except KeyboardInterrupt:
+            pass
+        dev.release_all()
+
+        print(json.dumps({"routines": sched.stats(), "device": dev.stats}, indent=2))
+    finally:
+        if monitor is not None:
+            monitor.stop()
+        _close_device(dev, chip)
+        if event_log is not None:
+            count = event_log.snapshot(args.log)
+            print(f"Wrote {count} frames to {args.log} ({event_log.evicted} evicted)")
+    return 0
+
+
+def cmd_replay(args) -> int:
+    try:
+        trace = list(_read_trace(args.trace))
+    except ValueError as exc:
+        print(exc, file=sys.stderr)
+        return 2
+
+    dev, chip = _open_device(args)
+    try:
+        start = time.perf_counter()
+        for t, frame in trace:
+            delay = start + t / args.speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            dev.submit(frame)
+        dev.drain()
+        print(f"Replayed {len(trace)} frames in {time.perf_counter() - start:.2f}s")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dev.release_all()
+        _close_device(dev, chip)
+    return 0
+
+
+def cmd_simulate(args) -> int:
+    from virtualChip import VirtualCH9329
+
+    chip = VirtualCH9329(baudrate=args.baud)
+    port = chip.start()
+    print(f"Virtual CH9329 on {port}" + (f" at {args.baud} baud" if args.baud else ""))
+    print("Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        chip.stop()
+    print(json.dumps({f"0x{cmd:02X}": n for cmd, n in sorted(chip.frames.items())}, indent=2))
+    return 0
+
+
+def cmd_bench(args) -> int:
+    from inputEvent import _build_keyboard_frame, _build_mouse_rel_frame
+
+    n = args.frames
+    start = time.perf_counter()
+    for i in range(n):
+        _build_mouse_rel_frame(i % 7 - 3, 3 - i % 7)
+    mouse_rate = n / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(n):
+        _build_keyboard_frame([0x04 + i % 26])
+    kb_rate = n / (time.perf_counter() - start)
+
+    print(f"frame build: mouse {mouse_rate:,.0f}/s, keyboard {kb_rate:,.0f}/s")
+
+    if args.no_link:
+        return 0
+
+    from ch9329Device import benchmark_producers
+
+    dev, chip = _open_device(args)
+    try:
+        if args.calibrate:
+            print(f"Calibrated: {dev.calibrate().calibration}")
+        results = benchmark_producers(dev, tuple(args.threads), args.link_frames)
+        for threads, rate in results.items():
+            print(f"link: {threads:>3} producer thread(s): {rate:,.0f} frames/s")
+    finally:
+        _close_device(dev, chip)
+    return 0
+
+
+def cmd_config(args) -> int:
+    from inputEvent import PARAM_FIELDS, get_param_field, set_param_field
+
+    dev, chip = _open_device(args)
+    try:
+        params = dev.get_parameter_block()
+
+        if args.action == "get":
+            names = args.fields or list(PARAM_FIELDS)
+            for name in names:
+                if name not in PARAM_FIELDS:
+                    print(f"Unknown field {name!r}. Known: {', '.join(PARAM_FIELDS)}", file=sys.stderr)
+                    return 2
+                print(f"{name}={get_param_field(params, name)}")
+            return 0
+
+        if not args.fields:
+            print("set needs at least one field=value", file=sys.stderr)
+            return 2
+        for item in args.fields:
+            name, sep, value = item.partition("=")
+            if not sep or name not in PARAM_FIELDS:
+                print(f"Expected field=value with field in: {', '.join(PARAM_FIELDS)}", file=sys.stderr)
+                return 2
+            try:
+                set_param_field(params, name, int(value, 0))
+            except (ValueError, OverflowError):
+                print(f"Bad value {value!r} for {name}: expected an integer that fits the field", file=sys.stderr)
+                return 2
+        dev.set_parameter_block(params)
+        print("Parameter block written; baud/mode changes apply after reset or power-cycle")
+    finally:
+        _close_device(dev, chip)
+    return 0
+
+
+# ---------- Entry point ----------
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="CH9329 input emulator")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_port(p, required=True):
+        p.add_argument("--port", required=required, default=None if required else "sim",
+                       help='serial port, e.g. /dev/ttyUSB0 or COM3; "sim" for a virtual chip')
+        p.add_argument("--baud", type=int, default=9600)
+
+    p = sub.add_parser("run", help="run routines or a schedule")
+    add_port(p)
+    p.add_argument("routines", nargs="*", help="routine names from ROUTINES, in order")
+    p.add_argument("--plan", help="JSON plan file (default: DEFAULT_PLAN)")
+    p.add_argument("--loop", action="store_true", help="repeat the named routines until stopped")
+    p.add_argument("--pause", type=float, default=1.0, help="pause between named routines (s)")
+    p.add_argument("--budget", type=float, help="stop after this many seconds")
+    p.add_argument("--seed", type=int, help="RNG seed (printed if omitted)")
+    p.add_argument("--calibrate", action="store_true", help="measure the link and pace frames")
+    p.add_argument("--monitor", action="store_true", help="gate frames on host USB status")
+    p.add_argument("--log", help="record sent frames and snapshot them to this file on exit")
+    p.add_argument("--log-size", type=int, default=1_000_000, help="max frames kept in the log")
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("replay", help="stream a recorded trace")
+    add_port(p)
+    p.add_argument("trace")
+    p.add_argument("--speed", type=float, default=1.0, help="time scale (2.0 = twice as fast)")
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("simulate", help="start a virtual CH9329 on a pty")
+    p.add_argument("--baud", type=int, default=None, help="emulate this UART speed")
+    p.set_defaults(func=cmd_simulate)
+
+    p = sub.add_parser("bench", help="frame-build and link throughput")
+    add_port(p, required=False)
+    p.add_argument("--frames", type=int, default=100_000, help="frames for the build benchmark")
+    p.add_argument("--link-frames", type=int, default=50, help="frames per thread for the link benchmark")
+    p.add_argument("--threads", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--calibrate", action="store_true")
+    p.add_argument("--no-link", action="store_true", help="only benchmark frame building")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("config", help="get or set parameter-block fields")
+    add_port(p)
+    p.add_argument("action", choices=["get", "set"])
+    p.add_argument("fields", nargs="*", help="field names (get) or field=value (set)")
+    p.set_defaults(func=cmd_config)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""
+eventLog.py
+
+Fixed-memory ring buffer of sent frames, for debugging long sessions.
+
+Appending every frame to a Python list costs tens of bytes of object
+overhead per 11-byte frame; over a day of routines across several
+boards that is gigabytes. EventLog instead preallocates one flat
+column per field and overwrites the oldest record once `capacity` is
+reached, so memory stays constant however long the session runs:
+
+    timestamp   array('d')   8 bytes  (time.time())
+    cmd         bytearray    1 byte
+    length      bytearray    1 byte   (original payload length)
+    payload     bytearray    PAYLOAD_BYTES bytes (truncated beyond that)
+    ack         bytearray    1 byte   (ACK_UNKNOWN unless set)
+
+That is 19 bytes per record. snapshot() copies the columns, oldest
+record first, under the lock (a memcpy: milliseconds even for a
+million records) and writes the file after releasing it, so appends
+from the device's writer thread never wait on disk I/O; load() reads
+a snapshot back.
+
+CH9329Device stamps each frame with the time it was submitted, so the
+spacing of frames that went out in one coalesced write is kept for
+replay, and stores the chip's ack status when it reads one.
+
+    log = EventLog(capacity=1_000_000)
+    dev = CH9329Device.open("/dev/ttyUSB0", event_log=log)
+    ...
+    log.snapshot("session.ch9log")
+"""
+
+import struct
+import threading
+import time
+from array import array
+from typing import Iterator, Optional
+
+# Keyboard reports carry 8 data bytes and mouse reports 5, so 8 covers
+# everything that gets replayed; parameter blocks are truncated.
+PAYLOAD_BYTES = 8
+
+ACK_UNKNOWN = 0xFF
+
+SNAPSHOT_MAGIC = b"CH9LOG1\0"
+# magic, record count, payload width
+_HEADER = struct.Struct("<8sQB")
+
+
+class EventLog:
+    """Ring buffer of (timestamp, cmd, payload, ack) records."""
+
+    def __init__(self, capacity: int = 100_000):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+
+        self._ts = array("d", bytes(8 * capacity))
+        self._cmd = bytearray(capacity)
+        self._len = bytearray(capacity)
+        self._payload = bytearray(capacity * PAYLOAD_BYTES)
+        self._ack = bytearray([ACK_UNKNOWN]) * capacity
+
+        self._count = 0  # records ever appended; also the next sequence number
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    @property
+    def evicted(self) -> int:
+        """Records overwritten so far."""
+        return max(0, self._count - self.capacity)
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the record columns (constant)."""
+        return (
+            self._ts.itemsize * len(self._ts)
+            + len(self._cmd) + len(self._len) + len(self._payload) + len(self._ack)
+        )
+
+    # ---------- Recording ----------
+
+    def append(
+        self,
+        cmd: int,
+        payload: bytes,
+        ts: Optional[float] = None,
+        ack: int = ACK_UNKNOWN,
+    ) -> int:
+        """Record one command. Returns its sequence number (for set_ack)."""
+        if ts is None:
+            ts = time.time()
+        n = min(len(payload), PAYLOAD_BYTES)
+
+        with self._lock:
+            seq = self._count
+            i = seq % self.capacity
+            self._ts[i] = ts
+            self._cmd[i] = cmd & 0xFF
+            self._len[i] = min(len(payload), 0xFF)
+            base = i * PAYLOAD_BYTES
+            self._payload[base:base + n] = payload[:n]
+            self._payload[base + n:base + PAYLOAD_BYTES] = bytes(PAYLOAD_BYTES - n)
+            self._ack[i] = ack & 0xFF
+            self._count = seq + 1
+        return seq
+
+    def set_ack(self, seq: int, status: int) -> bool:
+        """Set the ack status of record `seq`; False if it was evicted."""
+        with self._lock:
+            if seq >= self._count or seq < self._count - self.capacity:
+                return False
+            self._ack[seq % self.capacity] = status & 0xFF
+        return True
+
+    # ---------- Reading ----------
+
+    def __iter__(self) -> Iterator[tuple[float, int, bytes, int]]:
+        """(timestamp, cmd, payload, ack), oldest first."""
+        with self._lock:
+            count = len(self)
+            start = (self._count - count) % self.capacity
+            order = [(start + k) % self.capacity for k in range(count)]
+            records = []
+            for i in order:
+                n = min(self._len[i], PAYLOAD_BYTES)
+                base = i * PAYLOAD_BYTES
+                records.append((self._ts[i], self._cmd[i], bytes(self._payload[base:base + n]), self._ack[i]))
+        return iter(records)
+
+    def snapshot(self, path: str) -> int:
+        """
+        Write all records, oldest first, to `path`. The columns are
+        copied under the lock and written after it is released (see
+        module docstring). Returns the number of records written.
+        """
+        with self._lock:
+            count = len(self)
+            start = (self._count - count) % self.capacity
+            head = min(count, self.capacity - start)
+            chunks = []
+            for column, width in (
+                (memoryview(self._ts).cast("B"), 8),
+                (memoryview(self._cmd), 1),
+                (memoryview(self._len), 1),
+                (memoryview(self._payload), PAYLOAD_BYTES),
+                (memoryview(self._ack), 1),
+            ):
+                # Oldest part (start..end of buffer), then the wrapped part.
+                chunks.append(bytes(column[start * width:(start + head) * width]))
+                chunks.append(bytes(column[:(count - head) * width]))
+
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, count, PAYLOAD_BYTES))
+            f.writelines(chunks)
+        return count
+
+    @classmethod
+    def load(cls, path: str) -> "EventLog":
+        """Read a snapshot() file into a new EventLog sized to fit."""
+        with open(path, "rb") as f:
+            magic, count, width = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path}: not an EventLog snapshot")
+            if width != PAYLOAD_BYTES:
+                raise ValueError(f"{path}: payload width {width}, expected {PAYLOAD_BYTES}")
+
+            log = cls(max(1, count))
+            f.readinto(memoryview(log._ts).cast("B")[:count * 8])
+            f.readinto(memoryview(log._cmd)[:count])
+            f.readinto(memoryview(log._len)[:count])
+            f.readinto(memoryview(log._payload)[:count * PAYLOAD_BYTES])
+            f.readinto(memoryview(log._ack)[:count])
+            log._count = count
+        return log
+
+
+def is_snapshot(path: str) -> bool:
+    """True if `path` starts with the EventLog snapshot magic."""
+    with open(path, "rb") as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
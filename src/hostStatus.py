@@ -0,0 +1,115 @@
+"""
+hostStatus.py
+
+Cache of the target PC's USB state, as reported by the CH9329.
+
+CMD_GET_INFO (0x01) tells us whether the chip's USB side is enumerated
+by the host and what the keyboard LEDs are. Without it we keep
+streaming frames at a host that is unplugged or asleep, which wastes
+link time and fills buffers that later flush as a burst.
+
+HostStatusMonitor polls on a low-priority timer (a poll is skipped
+while the device has frames queued, unless the cached value is about
+to go stale) and caches the result for `ttl` seconds. On every change
+it tells the CH9329Device, which then drops pure motion frames and
+holds back discrete events (keys, clicks, wheel) until the host is
+back.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from inputEvent import _get_info
+
+
+class HostStatusMonitor:
+    """
+    Example:
+        monitor = HostStatusMonitor(dev, interval=1.0, ttl=3.0)
+        monitor.start()
+        ...
+        if monitor.leds().get("caps_lock"):
+            ...
+        monitor.stop()
+    """
+
+    def __init__(self, dev, interval: float = 1.0, ttl: float = 3.0):
+        self.dev = dev
+        self.interval = interval
+        self.ttl = ttl
+
+        self._status: Optional[dict] = None
+        self._updated = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {"polls": 0, "skipped": 0, "errors": 0}
+
+    # ---------- Control ----------
+
+    def start(self) -> None:
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="ch9329-host-status", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        # Don't leave the device gated on a stale reading.
+        self.dev.set_host_connected(True)
+
+    # ---------- Cache ----------
+
+    def status(self) -> Optional[dict]:
+        """Last GET_INFO result if younger than `ttl`, else None."""
+        if self._status is None or time.monotonic() - self._updated > self.ttl:
+            return None
+        return self._status
+
+    @property
+    def connected(self) -> bool:
+        """
+        Whether the host has the chip enumerated. Unknown (never polled,
+        or stale) counts as connected so producers are never stalled
+        on missing data.
+        """
+        status = self.status()
+        return True if status is None else status["usb_connected"]
+
+    def leds(self) -> dict:
+        """Cached keyboard LED state ({} if unknown)."""
+        status = self.status()
+        if status is None:
+            return {}
+        return {k: status[k] for k in ("num_lock", "caps_lock", "scroll_lock")}
+
+    def poll(self) -> dict:
+        """Query the chip now and update the cache."""
+        status = self.dev.call(_get_info)
+        self._status = status
+        self._updated = time.monotonic()
+        self.stats["polls"] += 1
+        self.dev.set_host_connected(status["usb_connected"])
+        return status
+
+    # ---------- Timer ----------
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            # Low priority: let queued frames go first unless the cache
+            # would expire before the next tick.
+            age = time.monotonic() - self._updated
+            if self.dev.pending() and age + self.interval < self.ttl:
+                self.stats["skipped"] += 1
+                continue
+            try:
+                self.poll()
+            except (RuntimeError, OSError):
+                self.stats["errors"] += 1
+                if self.status() is None:
+                    # No fresh reading: stop gating rather than hold
+                    # discrete events forever on an old "disconnected".
+                    self.dev.set_host_connected(True)
@@ -6,6 +6,10 @@ Helper functions for talking to a CH9329 over a CP2102 serial link.
 Requires:
     pip install pyserial
 
+Optional:
+    pip install numpy   (faster per-device RNG for the routines; see
+                         batchedRandom, which falls back to random)
+
 And your wiring:
     CP2102 TXD -> CH9329 RX
     CP2102 RXD -> CH9329 TX
@@ -15,8 +19,16 @@ And your wiring:
 The CH9329 is assumed to be in protocol mode at 9600 8N1.
 """
 
+from __future__ import annotations
+
+import random
+import threading
 import time
-import serial
+import weakref
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import serial  # imported lazily in open_serial() to keep startup fast
 
 from inputBitmasks import (
     MOD_NONE,
@@ -28,8 +40,10 @@ from inputBitmasks import (
 # ---------- Protocol constants (from CH9329 docs) ----------
 
 HEAD = [0x57, 0xAB]
+HEAD_BYTES = bytes(HEAD)
 ADDR_DEFAULT = 0x00
 
+CMD_GET_INFO             = 0x01  # chip version, USB status, LEDs
 CMD_SEND_KB_GENERAL_DATA = 0x02  # keyboard report
 CMD_SEND_MS_REL_DATA     = 0x05  # relative mouse move/click
 
@@ -48,6 +62,8 @@ def open_serial(port: str, baudrate: int = 9600, timeout: float = 0.2) -> serial
 
     :param port: e.g. "COM3" on Windows or "/dev/ttyUSB0" on Linux.
     """
+    import serial
+
     ser = serial.Serial(
         port=port,
         baudrate=baudrate,
@@ -77,6 +93,132 @@ def _build_frame(cmd: int, data: list[int], addr: int = ADDR_DEFAULT) -> bytes:
     checksum = _checksum(frame_wo_sum)
     return bytes(frame_wo_sum + [checksum & 0xFF])
 
+# Response to CMD_GET_INFO: HEAD(2)+ADDR+CMD+LEN+DATA(8)+SUM
+GET_INFO_RESPONSE_LEN = 2 + 1 + 1 + 1 + 8 + 1
+
+def _parse_info_response(resp: bytes) -> dict:
+    """
+    Decode a CMD_GET_INFO response frame.
+
+    DATA[0] = chip version
+    DATA[1] = USB enumeration status (0x01 = connected to host)
+    DATA[2] = LED status (bit0=NUM, bit1=CAPS, bit2=SCROLL)
+    DATA[3..7] = reserved
+    """
+    if len(resp) != GET_INFO_RESPONSE_LEN:
+        raise RuntimeError(f"Timeout or short read from CH9329 (got {len(resp)} bytes, expected {GET_INFO_RESPONSE_LEN})")
+
+    if resp[0] != HEAD[0] or resp[1] != HEAD[1]:
+        raise RuntimeError("Bad frame header in CMD_GET_INFO response")
+
+    if resp[3] != (CMD_GET_INFO | 0x80):  # 0x01 | 0x80 = 0x81
+        raise RuntimeError(f"Unexpected CMD in CMD_GET_INFO response: 0x{resp[3]:02X}")
+
+    if _checksum(list(resp[:-1])) != resp[-1]:
+        raise RuntimeError("Checksum mismatch in CMD_GET_INFO response")
+
+    leds = resp[7]
+    return {
+        "version": resp[5],
+        "usb_connected": resp[6] == 0x01,
+        "num_lock": bool(leds & 0x01),
+        "caps_lock": bool(leds & 0x02),
+        "scroll_lock": bool(leds & 0x04),
+    }
+
+def _get_info(ser: serial.Serial) -> dict:
+    """
+    Query chip version, host USB status and keyboard LEDs using
+    CMD_GET_INFO (0x01). See _parse_info_response for the fields.
+
+    Acks for reports sent just before may still be arriving after the
+    input buffer is cleared, so replies go through a FrameParser and
+    anything before the 0x81 response is skipped.
+    """
+    ser.reset_input_buffer()
+
+    ser.write(_build_frame(CMD_GET_INFO, []))
+    ser.flush()
+
+    parser = FrameParser()
+    while True:
+        chunk = ser.read(getattr(ser, "in_waiting", 0) or GET_INFO_RESPONSE_LEN)
+        if not chunk:
+            raise RuntimeError("Timeout waiting for CMD_GET_INFO response from CH9329")
+        for addr, cmd, data in parser.feed(chunk):
+            if cmd == (CMD_GET_INFO | 0x80):
+                return _parse_info_response(_build_frame(cmd, list(data), addr))
+
+class FrameParser:
+    """
+    Incremental parser for the CH9329 byte stream.
+
+    Feed it whatever bytes arrive; it returns complete, checksum-valid
+    frames as (addr, cmd, data) tuples and skips anything in between
+    (partial frames after a reset, line noise), resynchronizing on the
+    next HEAD.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self.dropped = 0  # bytes discarded while resynchronizing
+
+    def feed(self, data: bytes) -> list[tuple[int, int, bytes]]:
+        buf = self._buf
+        buf += data
+        frames = []
+
+        while True:
+            start = buf.find(HEAD_BYTES)
+            if start < 0:
+                # Keep a trailing first HEAD byte, it may be a split header.
+                keep = 1 if buf[-1:] == HEAD_BYTES[:1] else 0
+                self.dropped += len(buf) - keep
+                del buf[:len(buf) - keep]
+                break
+            if start:
+                self.dropped += start
+                del buf[:start]
+
+            if len(buf) < 5:
+                break
+            total = 2 + 1 + 1 + 1 + buf[4] + 1  # HEAD+ADDR+CMD+LEN+DATA+SUM
+            if len(buf) < total:
+                break
+
+            if _checksum(list(buf[:total - 1])) != buf[total - 1]:
+                # False header inside garbage: skip it and search again.
+                self.dropped += 1
+                del buf[:1]
+                continue
+
+            frames.append((buf[2], buf[3], bytes(buf[5:total - 1])))
+            del buf[:total]
+
+        return frames
+
+
+def _resync_stream(ser: serial.Serial, timeout: float = 0.5) -> bool:
+    """
+    Bring the byte stream back in step after a reset / reconnect.
+
+    Discards pending input, sends CMD_GET_INFO and runs replies through
+    a FrameParser until a valid CMD_GET_INFO response shows up. Returns
+    False if none arrives within `timeout`.
+    """
+    ser.reset_input_buffer()
+    ser.write(_build_frame(CMD_GET_INFO, []))
+    ser.flush()
+
+    parser = FrameParser()
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        chunk = ser.read(ser.in_waiting or 1)
+        for _addr, cmd, _data in parser.feed(chunk):
+            if cmd == (CMD_GET_INFO | 0x80):
+                return True
+    return False
+
 def _get_parameter_block(ser: serial.Serial) -> list[int]:
     """
     Read the 50-byte parameter configuration block from the CH9329
@@ -158,6 +300,38 @@ def _set_parameter_block(ser: serial.Serial, params: list[int]) -> None:
     
 # ---------- Config helpers ----------
 
+# Named fields of the 50-byte parameter block: name -> (offset, size, byte order).
+# The chip mixes byte orders: baudrate and the timing fields are
+# big-endian, but VID/PID are stored little-endian like in the USB
+# descriptor (factory default 86 1A 29 E1 = VID 0x1A86, PID 0xE129).
+PARAM_FIELDS = {
+    "chip_mode":          (0, 1, "big"),
+    "serial_mode":        (1, 1, "big"),
+    "serial_addr":        (2, 1, "big"),
+    "baudrate":           (3, 4, "big"),
+    "packet_interval":    (9, 2, "big"),
+    "vid":                (11, 2, "little"),
+    "pid":                (13, 2, "little"),
+    "kb_upload_interval": (15, 2, "big"),
+    "kb_release_delay":   (17, 2, "big"),
+    "kb_auto_enter":      (19, 1, "big"),
+    "usb_string_enable":  (44, 1, "big"),
+    "kb_fast_upload":     (45, 1, "big"),
+}
+
+def get_param_field(params: list[int], name: str) -> int:
+    """Read a named field (see PARAM_FIELDS) from a parameter block."""
+    offset, size, order = PARAM_FIELDS[name]
+    return int.from_bytes(bytes(params[offset:offset + size]), order)
+
+def set_param_field(params: list[int], name: str, value: int) -> None:
+    """
+    Overwrite a named field (see PARAM_FIELDS) in a parameter block, in
+    place. Raises OverflowError if `value` doesn't fit the field.
+    """
+    offset, size, order = PARAM_FIELDS[name]
+    params[offset:offset + size] = list(value.to_bytes(size, order))
+
 def set_baudrate_115200(ser: serial.Serial) -> None:
     """
     Permanently change the CH9329's UART baudrate setting to 115200 bps.
@@ -173,8 +347,7 @@ def set_baudrate_115200(ser: serial.Serial) -> None:
     params = _get_parameter_block(ser)
 
     # 2) Overwrite the 4-byte baud field (index 3..6, big-endian)
-    baud_bytes = (115200).to_bytes(4, "big")  # 0x00 0x01 0xC2 0x00
-    params[3:7] = list(baud_bytes)
+    set_param_field(params, "baudrate", 115200)  # 0x00 0x01 0xC2 0x00
 
     # 3) Write it back
     _set_parameter_block(ser, params)
@@ -264,14 +437,13 @@ def key_tap(
     keycode: int,
     modifiers: int = MOD_NONE,
     delay: float = 0.03,
+    rng=random,
 ):
-    import random
-
     
-    travel_delay = random.uniform(0.05, 0.4)
+    travel_delay = rng.uniform(0.05, 0.4)
 
    
-    jitter_factor = random.uniform(0.6, 1.4)
+    jitter_factor = rng.uniform(0.6, 1.4)
     dwell_delay = max(0.02, delay * jitter_factor)
 
     time.sleep(travel_delay)
@@ -362,6 +534,7 @@ def mouse_move(
     frame = _build_mouse_rel_frame(dx, dy, buttons, wheel)
     ser.write(frame)
     ser.flush()
+    _sync_mouse_state(ser, buttons)
 
 
 def mouse_down(ser: serial.Serial, button_mask: int):
@@ -375,6 +548,7 @@ def mouse_down(ser: serial.Serial, button_mask: int):
     frame = _build_mouse_rel_frame(0, 0, buttons=button_mask)
     ser.write(frame)
     ser.flush()
+    _sync_mouse_state(ser, button_mask)
 
 
 def mouse_up(ser: serial.Serial):
@@ -384,3 +558,174 @@ def mouse_up(ser: serial.Serial):
     frame = _build_mouse_rel_frame(0, 0, buttons=0x00)
     ser.write(frame)
     ser.flush()
+    _sync_mouse_state(ser, 0x00)
+
+
+def release_all(ser: serial.Serial):
+    """
+    Release every key and mouse button.
+
+    Sent after a reconnect so nothing stays stuck down on the host.
+    """
+    ser.write(_build_keyboard_frame([], MOD_NONE) + _build_mouse_rel_frame(0, 0, buttons=0x00))
+    ser.flush()
+    _sync_mouse_state(ser, 0x00, reset=True)
+
+
+# ---------- Mouse state engine ----------
+
+class MouseStateEngine:
+    """
+    Builds relative mouse frames from moves, wheel ticks and button
+    presses, folding the latter into the next motion frame.
+
+    Wheel and buttons are separate bytes of the same 0x05 report as
+    dx/dy, so a pending wheel delta or button press costs nothing extra
+    when the caller's next move() carries it. Nothing is sent from
+    another thread: whatever is still pending goes out on the next
+    move() or flush(), so a helper that may not move again should end
+    with flush(). Wheel ticks are summed up to the signed byte limit
+    (+/-127).
+
+    Only presses are held back, so that a press followed by a move
+    starts a drag in one frame. A release is sent right away (after
+    anything pending), so a click never turns into a drag.
+
+    The engine only keeps a weak reference to the port. The raw mouse
+    helpers (mouse_move, mouse_down, mouse_up, release_all) keep it in
+    step with the buttons they send.
+
+    Example:
+        mouse = mouse_state(ser)
+        mouse.wheel(-2)
+        mouse.move(10, 4)        # one frame: dx=10, dy=4, wheel=-2
+        mouse.press(MOUSE_LEFT)
+        mouse.move(3, 0)         # one frame: drag starts with this move
+        mouse.release(MOUSE_LEFT)
+    """
+
+    def __init__(self, ser: serial.Serial):
+        try:
+            self._port = weakref.ref(ser)
+        except TypeError:  # not weak-referenceable
+            self._port = lambda: ser
+
+        self._lock = threading.Lock()
+        self._buttons = 0x00           # state last sent
+        self._pending_buttons: Optional[int] = None
+        self._wheel = 0
+
+        self.stats = {"frames": 0, "folded": 0}
+
+    @property
+    def ser(self) -> serial.Serial:
+        ser = self._port()
+        if ser is None:
+            raise RuntimeError("The port of this MouseStateEngine is gone")
+        return ser
+
+    @property
+    def buttons(self) -> int:
+        """Button state as of the latest call (sent or pending)."""
+        with self._lock:
+            return self._buttons if self._pending_buttons is None else self._pending_buttons
+
+    # ---------- Events ----------
+
+    def move(self, dx: int, dy: int) -> None:
+        """Send a motion frame now, carrying anything pending."""
+        with self._lock:
+            folded = (self._pending_buttons is not None) + (self._wheel != 0)
+            self.stats["folded"] += folded
+            self._send(dx, dy)
+
+    def wheel(self, ticks: int) -> None:
+        """Queue wheel ticks (negative = scroll down)."""
+        with self._lock:
+            if abs(self._wheel + ticks) > 127:
+                self._send(0, 0)
+            self._wheel = max(-127, min(127, self._wheel + ticks))
+
+    def set_buttons(self, mask: int) -> None:
+        """
+        Change the full button state. Pure presses wait for the next
+        move(); anything that releases a button is sent now.
+        """
+        mask &= MOUSE_LEFT | MOUSE_RIGHT | MOUSE_MIDDLE
+        with self._lock:
+            current = self._buttons if self._pending_buttons is None else self._pending_buttons
+            if mask == current:
+                return
+            if mask & current == current:
+                self._pending_buttons = mask
+                return
+            if self._pending_buttons is not None:
+                # The press must reach the host before its release.
+                self._send(0, 0)
+            self._pending_buttons = mask
+            self._send(0, 0)
+
+    def press(self, mask: int) -> None:
+        self.set_buttons(self.buttons | mask)
+
+    def release(self, mask: int) -> None:
+        self.set_buttons(self.buttons & ~mask)
+
+    def flush(self) -> None:
+        """Send anything pending right away."""
+        with self._lock:
+            if self._pending_buttons is not None or self._wheel:
+                self._send(0, 0)
+
+    # ---------- Internals ----------
+
+    def _send(self, dx: int, dy: int) -> None:
+        # Called with _lock held.
+        if self._pending_buttons is not None:
+            self._buttons = self._pending_buttons
+            self._pending_buttons = None
+        wheel, self._wheel = self._wheel, 0
+
+        ser = self.ser
+        ser.write(_build_mouse_rel_frame(dx, dy, self._buttons, wheel))
+        ser.flush()
+        self.stats["frames"] += 1
+
+    def _sync(self, buttons: int, reset: bool = False) -> None:
+        """
+        Record button state sent around the engine; `reset` also drops
+        pending wheel ticks. Plain stores without _lock: this can run on
+        a CH9329Device writer thread while a producer holds the lock
+        waiting for that same thread.
+        """
+        self._buttons = buttons
+        self._pending_buttons = None
+        if reset:
+            self._wheel = 0
+
+
+_mouse_states: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+_mouse_states_lock = threading.Lock()
+
+def mouse_state(ser: serial.Serial) -> MouseStateEngine:
+    """
+    The MouseStateEngine for `ser`, created on first use, so pending
+    wheel/button events carry over between helper calls on one port.
+    """
+    with _mouse_states_lock:
+        try:
+            engine = _mouse_states.get(ser)
+        except TypeError:  # not weak-referenceable: no sharing
+            return MouseStateEngine(ser)
+        if engine is None:
+            engine = _mouse_states[ser] = MouseStateEngine(ser)
+        return engine
+
+def _sync_mouse_state(ser: serial.Serial, buttons: int, reset: bool = False) -> None:
+    """Tell the engine for `ser` (if any) about buttons sent around it."""
+    try:
+        engine = _mouse_states.get(ser)
+    except TypeError:
+        return
+    if engine is not None:
+        engine._sync(buttons, reset)
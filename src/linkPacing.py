@@ -0,0 +1,136 @@
+"""
+linkPacing.py
+
+Measure how fast the CH9329 actually consumes frames on the current
+link, and derive sender pacing from it.
+
+At 9600 baud an 11-byte mouse frame takes ~11.5 ms on the wire, so
+the tiny sleeps in chrome_routines just let the host write buffer grow
+and every new frame lands behind a pile of old ones. Calibration:
+  - a few CMD_GET_INFO (0x01) round trips give the per-command latency,
+  - a pipelined burst of no-op mouse reports (all written at once, then
+    all 7-byte acks read back) gives the effective frames/s for the
+    11-byte reports the routines actually send.
+
+LinkPacer turns that into a minimum interval between frames and a
+queue depth for CH9329Device, and tells the device when observed
+queueing latency has drifted far enough that it should re-calibrate.
+"""
+
+import time
+
+from inputEvent import (
+    CMD_SEND_MS_REL_DATA,
+    FrameParser,
+    _build_mouse_rel_frame,
+    _get_info,
+)
+
+# Ack to a keyboard/mouse report: HEAD(2)+ADDR+CMD+LEN+STATUS+SUM
+ACK_LEN = 2 + 1 + 1 + 1 + 1 + 1
+
+
+class LinkCalibration:
+    """Result of calibrate_link()."""
+
+    def __init__(self, baudrate: int, frames_per_s: float, latency_s: float):
+        self.baudrate = baudrate
+        self.frames_per_s = frames_per_s
+        self.latency_s = latency_s
+
+    def __repr__(self) -> str:
+        return (
+            f"LinkCalibration(baudrate={self.baudrate}, "
+            f"frames_per_s={self.frames_per_s:.1f}, latency_s={self.latency_s * 1000:.2f}ms)"
+        )
+
+
+def calibrate_link(ser, rounds: int = 5, burst: int = 16, buttons: int = 0x00) -> LinkCalibration:
+    """
+    Measure effective frames/s and round-trip latency on `ser`.
+
+    The throughput burst is zero-motion mouse reports carrying `buttons`,
+    so pass the current button state to avoid releasing a drag.
+
+    Needs exclusive access to the port; with a CH9329Device use
+    dev.calibrate() (which runs this on the writer thread).
+    """
+    # 1) Single round trips -> latency
+    rtts = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        _get_info(ser)
+        rtts.append(time.perf_counter() - start)
+    latency = sorted(rtts)[len(rtts) // 2]  # median, ignores one-off stalls
+
+    # 2) Pipelined burst of reports -> throughput, timed to the last ack
+    ser.reset_input_buffer()
+    frame = _build_mouse_rel_frame(0, 0, buttons=buttons)
+    parser = FrameParser()
+    acks = 0
+    start = time.perf_counter()
+    ser.write(frame * burst)
+    ser.flush()
+    while acks < burst:
+        chunk = ser.read((burst - acks) * ACK_LEN)
+        if not chunk:
+            break  # read timeout
+        acks += sum(1 for _addr, cmd, _data in parser.feed(chunk) if cmd == (CMD_SEND_MS_REL_DATA | 0x80))
+    elapsed = time.perf_counter() - start
+
+    if acks < burst:
+        raise RuntimeError(f"CH9329 acked only {acks} of {burst} calibration reports")
+
+    frames_per_s = burst / elapsed if elapsed > 0 else float("inf")
+    return LinkCalibration(getattr(ser, "baudrate", 0), frames_per_s, latency)
+
+
+class LinkPacer:
+    """
+    Sender pacing derived from a LinkCalibration.
+
+    frame_interval: minimum seconds between frames put on the wire.
+    max_depth:      frames allowed to wait in the device queue; enough
+                    to cover `target_latency` at the measured rate.
+    """
+
+    def __init__(
+        self,
+        target_latency: float = 0.05,
+        drift_factor: float = 2.0,
+        smoothing: float = 0.1,
+    ):
+        self.target_latency = target_latency
+        self.drift_factor = drift_factor
+        self.smoothing = smoothing
+
+        self.calibration = None
+        self.frame_interval = 0.0
+        self.max_depth = 0  # 0 = unbounded
+        self.observed_latency = 0.0
+
+    def retune(self, cal: LinkCalibration) -> None:
+        """Recompute pacing from a fresh calibration."""
+        self.calibration = cal
+        fps = max(cal.frames_per_s, 1.0)
+        self.frame_interval = 1.0 / fps
+        self.max_depth = max(1, int(fps * self.target_latency))
+        self.observed_latency = cal.latency_s
+
+    def observe(self, latency: float) -> bool:
+        """
+        Feed one queue->wire latency sample.
+
+        Returns True when the smoothed latency has grown past
+        `drift_factor` times what the last calibration predicted (a full
+        queue at the calibrated rate), i.e. the link has slowed down and
+        should be re-calibrated.
+        """
+        if self.calibration is None:
+            return False
+
+        a = self.smoothing
+        self.observed_latency = (1 - a) * self.observed_latency + a * latency
+
+        expected = self.calibration.latency_s + self.max_depth * self.frame_interval
+        return self.observed_latency > expected * self.drift_factor
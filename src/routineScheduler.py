@@ -0,0 +1,381 @@
+"""
+routineScheduler.py
+
+Declarative, time-budgeted scheduler over a routine registry
+(normally chrome_routines.ROUTINES).
+
+A plan is a plain dict:
+
+    plan = {
+        "loop": True,            # repeat the phases until stopped / out of budget
+        "budget_s": 3600,        # optional total time budget
+        "limits": {              # optional per-device limits, by routine name
+            "routine_5": {"max_runs": 20, "max_seconds": 300},
+        },
+        "phases": [
+            {
+                "mode": "shuffle",       # each routine once, weight-biased order
+                "reps": (3, 5),          # repetitions per pick (inclusive range)
+                "pause": (0.5, 3.0),     # pause after every repetition
+                "budget_s": 120,         # optional phase time budget
+                "routines": {"routine_1": 1, "routine_3": 1, "routine_6": 1},
+            },
+            {
+                "mode": "weighted",      # `draws` picks with replacement by weight
+                "draws": 4,
+                "routines": {
+                    "routine_1": 3,
+                    "routine_5": {"weight": 1, "reps": (1, 1), "kwargs": {"query": "weather"}},
+                },
+            },
+        ],
+    }
+
+A routine entry is either a weight or a dict with "weight" plus any of
+"reps", "pause" and "kwargs" overriding the phase. Weight 0 disables a
+routine without deleting it from the plan; a plan must leave at least
+one routine runnable. A looping plan also ends once every runnable
+routine has reached its limits.
+
+Every routine is called as routine(ser, rng=..., **kwargs) with the
+scheduler's own stream from batchedRandom.new_rng() (NumPy-backed if
+available), so each device gets independent, seedable randomness. A background thread compiles the next few steps
+(routine, arguments, pause) while the current one plays. Cancellation is cooperative: stop()
+takes effect between routines and cuts any pending pause short.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from batchedRandom import new_rng
+
+_END = object()
+
+
+class RoutineStats:
+    """Execution stats for one routine on one device."""
+
+    def __init__(self):
+        self.runs = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.min_s = float("inf")
+        self.max_s = 0.0
+
+    def record(self, elapsed: float, ok: bool = True) -> None:
+        self.runs += 1
+        if not ok:
+            self.errors += 1
+        self.total_s += elapsed
+        self.min_s = min(self.min_s, elapsed)
+        self.max_s = max(self.max_s, elapsed)
+
+    def as_dict(self) -> dict:
+        return {
+            "runs": self.runs,
+            "errors": self.errors,
+            "total_s": self.total_s,
+            "mean_s": self.total_s / self.runs if self.runs else 0.0,
+            "min_s": self.min_s if self.runs else 0.0,
+            "max_s": self.max_s,
+        }
+
+
+class _Step:
+    """One compiled routine invocation."""
+
+    __slots__ = ("pass_no", "phase", "name", "kwargs", "pause_s")
+
+    def __init__(self, pass_no: int, phase: int, name: str, kwargs: dict, pause_s: float):
+        self.pass_no = pass_no
+        self.phase = phase
+        self.name = name
+        self.kwargs = kwargs
+        self.pause_s = pause_s
+
+
+class RoutineScheduler:
+    """
+    Run a plan (see module docstring) against one device.
+
+    Example:
+        sched = RoutineScheduler(ser, DEFAULT_PLAN, ROUTINES)
+        sched.start()
+        ...
+        sched.stop()
+        print(sched.stats())
+    """
+
+    def __init__(
+        self,
+        ser,
+        plan: dict,
+        routines: Dict[str, Callable[..., None]],
+        lookahead: int = 4,
+        seed: Optional[int] = None,
+    ):
+        self.ser = ser
+        self.plan = plan
+        self.routines = routines
+        self.lookahead = max(1, lookahead)
+
+        # Separate streams for the compiler thread and the routines, so
+        # neither has to share a generator across threads.
+        root = new_rng(seed)
+        self.seed = root.seed
+        self._plan_rng, self.rng = root.spawn(2)
+
+        self._runnable = self._check_plan()
+
+        self._stop = threading.Event()
+        self._steps: "queue.Queue[object]" = queue.Queue(maxsize=self.lookahead)
+        self._stats: Dict[str, RoutineStats] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._compile_error: Optional[Exception] = None
+
+    # ---------- Control ----------
+
+    def start(self) -> threading.Thread:
+        """Run the plan in a background thread."""
+        # Cleared here, not in run(), so a stop() that lands before the
+        # thread gets going still counts.
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, name="routine-scheduler", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, wait: bool = True) -> None:
+        """Ask the scheduler to stop after the current routine."""
+        self._stop.set()
+        if wait and self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    @property
+    def stopped(self) -> bool:
+        return self._stop.is_set()
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds`; returns True early if stop() was called."""
+        return self._stop.wait(max(0.0, seconds))
+
+    def stats(self) -> Dict[str, dict]:
+        """Per-routine execution stats, by routine name."""
+        return {name: st.as_dict() for name, st in self._stats.items()}
+
+    # ---------- Execution ----------
+
+    def run(self) -> None:
+        """
+        Execute the plan until it finishes, its budget runs out or
+        stop() is called (a stopped scheduler runs again after start()).
+        Exceptions from a routine are recorded in its stats and then
+        re-raised; so are exceptions from compiling the plan.
+        """
+        self._steps = queue.Queue(maxsize=self.lookahead)
+        self._compile_error = None
+        done = threading.Event()
+        compiler = threading.Thread(target=self._compile, args=(done,), name="routine-compiler", daemon=True)
+        compiler.start()
+
+        budget = self.plan.get("budget_s")
+        started = time.monotonic()
+        phase_started: Dict[int, float] = {}
+        current_pass = 0
+
+        try:
+            while not self._stop.is_set():
+                step = self._next_step()
+                if step is _END:
+                    if self._compile_error is not None:
+                        raise self._compile_error
+                    break
+                if step is None:
+                    continue
+
+                now = time.monotonic()
+                if budget is not None and now - started >= budget:
+                    break
+
+                # Each pass over the phases restarts the phase budgets.
+                if step.pass_no != current_pass:
+                    current_pass = step.pass_no
+                    phase_started.clear()
+
+                phase = self.plan["phases"][step.phase]
+                phase_started.setdefault(step.phase, now)
+                phase_budget = phase.get("budget_s")
+                if phase_budget is not None and now - phase_started[step.phase] >= phase_budget:
+                    continue
+                if self._over_limit(step.name):
+                    if all(self._over_limit(name) for name in self._runnable):
+                        break  # every routine is spent; a looping plan would spin
+                    continue
+
+                self._run_step(step)
+
+                if step.pause_s > 0:
+                    self.wait(step.pause_s)
+        finally:
+            done.set()
+            compiler.join()
+
+    def _next_step(self):
+        try:
+            return self._steps.get(timeout=0.1)
+        except queue.Empty:
+            return None
+
+    def _run_step(self, step: _Step) -> None:
+        func = self.routines[step.name]
+        stats = self._stats.setdefault(step.name, RoutineStats())
+
+        start = time.monotonic()
+        try:
+            func(self.ser, rng=self.rng, **step.kwargs)
+        except Exception:
+            stats.record(time.monotonic() - start, ok=False)
+            raise
+        stats.record(time.monotonic() - start)
+
+    def _over_limit(self, name: str) -> bool:
+        limit = self.plan.get("limits", {}).get(name)
+        if not limit:
+            return False
+        stats = self._stats.get(name)
+        if stats is None:
+            return False
+        max_runs = limit.get("max_runs")
+        if max_runs is not None and stats.runs >= max_runs:
+            return True
+        max_seconds = limit.get("max_seconds")
+        if max_seconds is not None and stats.total_s >= max_seconds:
+            return True
+        return False
+
+    # ---------- Compilation ----------
+
+    def _compile(self, done: threading.Event) -> None:
+        """
+        Producer thread: expand the plan into concrete steps ahead of
+        time, until the plan ends or run() sets `done`. An exception is
+        handed to run() instead of killing the thread silently.
+        """
+        try:
+            pass_no = 0
+            while not done.is_set():
+                for index, phase in enumerate(self.plan["phases"]):
+                    for step in self._compile_phase(pass_no, index, phase):
+                        if not self._put(step, done):
+                            return
+                if not self.plan.get("loop", False):
+                    break
+                pass_no += 1
+        except Exception as exc:
+            self._compile_error = exc
+        self._put(_END, done)
+
+    def _put(self, item, done: threading.Event) -> bool:
+        while not done.is_set():
+            try:
+                self._steps.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _compile_phase(self, pass_no: int, index: int, phase: dict):
+        entries = {
+            name: _entry(spec)
+            for name, spec in phase["routines"].items()
+        }
+        entries = {name: e for name, e in entries.items() if e["weight"] > 0}
+        if not entries:
+            return
+
+        mode = phase.get("mode", "shuffle")
+        rng = self._plan_rng
+        if mode == "shuffle":
+            order = _weighted_order(entries, rng)
+        else:
+            order = [_weighted_pick(entries, rng) for _ in range(phase.get("draws", 1))]
+
+        for name in order:
+            entry = entries[name]
+            lo, hi = entry.get("reps", phase.get("reps", (1, 1)))
+            pause = entry.get("pause", phase.get("pause", (0.0, 0.0)))
+            kwargs = entry.get("kwargs", {})
+            for _ in range(rng.randint(lo, hi)):
+                yield _Step(pass_no, index, name, kwargs, rng.uniform(*pause))
+
+    def _check_plan(self) -> set:
+        """Validate the plan; returns the names of routines it can run."""
+        if not isinstance(self.plan, dict):
+            raise ValueError("Plan must be a dict")
+        phases = self.plan.get("phases")
+        if not phases or not isinstance(phases, list):
+            raise ValueError("Plan must have a list of at least one phase")
+        runnable = set()
+        for phase in phases:
+            if not isinstance(phase, dict) or not isinstance(phase.get("routines"), dict):
+                raise ValueError("Every phase must be a dict with a 'routines' dict")
+            mode = phase.get("mode", "shuffle")
+            if mode not in ("shuffle", "weighted"):
+                raise ValueError(f"Unknown phase mode {mode!r}")
+            phase_budget = phase.get("budget_s")
+            if phase_budget is not None and phase_budget <= 0:
+                raise ValueError("Phase budget_s must be positive")
+            draws = phase.get("draws", 1)
+            if not isinstance(draws, int) or isinstance(draws, bool) or draws < 0:
+                raise ValueError(f"Phase draws must be a non-negative integer, got {draws!r}")
+            for name, spec in phase["routines"].items():
+                if name not in self.routines:
+                    raise ValueError(f"Plan references unknown routine {name!r}")
+                entry = _entry(spec)
+                weight = entry["weight"]
+                if not isinstance(weight, (int, float)) or isinstance(weight, bool) or weight < 0:
+                    raise ValueError(f"Weight of {name!r} must be a non-negative number, got {weight!r}")
+                _, max_reps = _check_range(entry.get("reps", phase.get("reps", (1, 1))), f"reps of {name!r}", int)
+                _check_range(entry.get("pause", phase.get("pause", (0.0, 0.0))), f"pause of {name!r}", (int, float))
+                if weight > 0 and max_reps >= 1 and (mode == "shuffle" or draws >= 1):
+                    runnable.add(name)
+        if not runnable:
+            raise ValueError("Plan has no runnable routine (all weights, reps or draws are 0)")
+        return runnable
+
+
+def _check_range(value, what: str, kind) -> tuple:
+    """Validate a (min, max) pair with 0 <= min <= max; returns it."""
+    try:
+        lo, hi = value
+    except (TypeError, ValueError):
+        raise ValueError(f"{what} must be a (min, max) pair, got {value!r}") from None
+    for v in (lo, hi):
+        if not isinstance(v, kind) or isinstance(v, bool):
+            raise ValueError(f"{what} must be a (min, max) pair of numbers, got {value!r}")
+    if not 0 <= lo <= hi:
+        raise ValueError(f"{what} must satisfy 0 <= min <= max, got {value!r}")
+    return lo, hi
+
+
+def _entry(spec) -> dict:
+    if isinstance(spec, dict):
+        return {"weight": 1, **spec}
+    return {"weight": spec}
+
+
+def _weighted_order(entries: dict, rng) -> list[str]:
+    """Every routine once, heavier weights tending to come first."""
+    keys = {name: rng.random() ** (1.0 / e["weight"]) for name, e in entries.items()}
+    return sorted(keys, key=keys.get, reverse=True)
+
+
+def _weighted_pick(entries: dict, rng) -> str:
+    total = sum(e["weight"] for e in entries.values())
+    r = rng.random() * total
+    for name, e in entries.items():
+        r -= e["weight"]
+        if r < 0:
+            return name
+    return name
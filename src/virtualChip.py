@@ -0,0 +1,143 @@
+"""
+virtualChip.py
+
+A software CH9329 on a pseudo-terminal, for trying routines, replays
+and benchmarks without hardware (POSIX only).
+
+    chip = VirtualCH9329(baudrate=9600)
+    chip.start()
+    dev = CH9329Device.open(chip.port)   # e.g. /dev/pts/7
+    ...
+    chip.stop()
+
+It answers the commands this library uses the way the real chip does:
+CMD_GET_INFO, CMD_GET_PARA_CFG / CMD_SET_PARA_CFG, CMD_RESET, and an
+ack (status 0x00) for keyboard and mouse reports. With a `baudrate`,
+it also sleeps for the wire time of every byte it receives, so link
+throughput looks like the real UART's.
+"""
+
+import os
+import select
+import threading
+import time
+import tty
+from typing import Optional
+
+from inputEvent import (
+    CMD_GET_INFO,
+    CMD_GET_PARA_CFG,
+    CMD_RESET,
+    CMD_SEND_KB_GENERAL_DATA,
+    CMD_SEND_MS_REL_DATA,
+    CMD_SET_PARA_CFG,
+    FrameParser,
+    _build_frame,
+    set_param_field,
+)
+
+STATUS_OK = 0x00
+CHIP_VERSION = 0x30
+
+
+def default_parameter_block(baudrate: int = 9600) -> list[int]:
+    """A factory-default looking 50-byte parameter block."""
+    params = [0x00] * 50
+    set_param_field(params, "baudrate", baudrate)
+    set_param_field(params, "packet_interval", 3)
+    set_param_field(params, "vid", 0x1A86)
+    set_param_field(params, "pid", 0xE129)
+    set_param_field(params, "kb_release_delay", 1)
+    return params
+
+
+class VirtualCH9329:
+    """Emulated CH9329 behind the slave side of a pty (see module docstring)."""
+
+    def __init__(self, baudrate: Optional[int] = None):
+        self.baudrate = baudrate
+        self.params = default_parameter_block(baudrate or 9600)
+        self.usb_connected = True
+        self.leds = 0x00
+
+        self.frames: dict[int, int] = {}  # cmd -> count received
+        self.dropped_replies = 0
+        self.port: Optional[str] = None
+
+        self._master: Optional[int] = None
+        self._slave: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> str:
+        """Create the pty and start answering. Returns the port path."""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        # Nobody reads the acks for keyboard/mouse reports; like a real
+        # UART with a full RX buffer, replies are dropped rather than
+        # blocking the emulator.
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="virtual-ch9329", daemon=True)
+        self._thread.start()
+        return self.port
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def __enter__(self) -> "VirtualCH9329":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ---------- Emulation ----------
+
+    def _loop(self) -> None:
+        parser = FrameParser()
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], 0.1)
+            if not ready:
+                continue
+            try:
+                data = os.read(self._master, 4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                return
+
+            if self.baudrate:
+                time.sleep(len(data) * 10 / self.baudrate)  # 8N1 = 10 bits/byte
+
+            for addr, cmd, payload in parser.feed(data):
+                self.frames[cmd] = self.frames.get(cmd, 0) + 1
+                reply = self._handle(cmd, payload)
+                if reply is not None:
+                    try:
+                        os.write(self._master, _build_frame(cmd | 0x80, reply, addr))
+                    except BlockingIOError:
+                        self.dropped_replies += 1
+
+    def _handle(self, cmd: int, payload: bytes) -> Optional[list[int]]:
+        if cmd == CMD_GET_INFO:
+            return [CHIP_VERSION, 0x01 if self.usb_connected else 0x00, self.leds, 0, 0, 0, 0, 0]
+        if cmd == CMD_GET_PARA_CFG:
+            return list(self.params)
+        if cmd == CMD_SET_PARA_CFG:
+            if len(payload) != 50:
+                return [0xE5]  # parameter error
+            self.params = list(payload)
+            return [STATUS_OK]
+        if cmd in (CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA, CMD_RESET):
+            return [STATUS_OK]
+        return None
@@ -0,0 +1,79 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir, "src"))
+
+from inputEvent import FrameParser, _build_frame  # noqa: E402
+from virtualChip import VirtualCH9329  # noqa: E402
+
+
+class FakePort:
+    """
+    Stands in for serial.Serial in front of a CH9329: records every
+    write() and answers like VirtualCH9329 does.
+
+    Replies are "on the wire" until the next read(), so, as on real
+    hardware, acks for frames written before reset_input_buffer() can
+    still arrive after it.
+    """
+
+    def __init__(self, chip: VirtualCH9329 = None):
+        self.chip = chip or VirtualCH9329()
+        self.writes: list[bytes] = []
+        self.closed = False
+        self.timeout = 0.2
+        self.fail_writes: list[BaseException] = []  # raised by the next write() calls
+
+        self._parser = FrameParser()
+        self._wire = bytearray()
+        self._rx = bytearray()
+        self._lock = threading.Lock()
+
+    def write(self, data: bytes) -> int:
+        with self._lock:
+            if self.fail_writes:
+                raise self.fail_writes.pop(0)
+            self.writes.append(bytes(data))
+            for addr, cmd, payload in self._parser.feed(data):
+                self.chip.frames[cmd] = self.chip.frames.get(cmd, 0) + 1
+                reply = self.chip._handle(cmd, payload)
+                if reply is not None:
+                    self._wire += _build_frame(cmd | 0x80, reply, addr)
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def read(self, size: int = 1) -> bytes:
+        with self._lock:
+            self._rx += self._wire
+            self._wire.clear()
+            data = bytes(self._rx[:size])
+            del self._rx[:size]
+        return data
+
+    @property
+    def in_waiting(self) -> int:
+        return len(self._rx)
+
+    def reset_input_buffer(self) -> None:
+        with self._lock:
+            self._rx.clear()
+
+    def close(self) -> None:
+        self.closed = True
+
+    def frames(self) -> list[tuple[int, int, bytes]]:
+        """Every frame written so far, as FrameParser (addr, cmd, data) tuples."""
+        parser = FrameParser()
+        frames = parser.feed(b"".join(self.writes))
+        assert parser.dropped == 0
+        return frames
+
+
+@pytest.fixture
+def port() -> FakePort:
+    return FakePort()
@@ -0,0 +1,49 @@
+import pytest
+
+import batchedRandom
+from batchedRandom import BatchedRNG, SimpleRNG, new_rng
+
+needs_numpy = pytest.mark.skipif(batchedRandom.np is None, reason="needs NumPy")
+
+
+@needs_numpy
+def test_same_seed_same_draws():
+    a, b = BatchedRNG(7, block_size=16), BatchedRNG(7, block_size=16)
+    assert [a.random() for _ in range(40)] == [b.random() for _ in range(40)]
+
+
+@needs_numpy
+def test_spawned_stream_replays_from_seed_and_spawn_key():
+    _plan, child = BatchedRNG().spawn(2)
+    replay = BatchedRNG(child.seed, spawn_key=child.spawn_key)
+
+    assert child.spawn_key == (1,)
+    assert [child.randint(0, 99) for _ in range(20)] == [replay.randint(0, 99) for _ in range(20)]
+
+
+@needs_numpy
+def test_randint_bounds_are_inclusive():
+    rng = BatchedRNG(1)
+    draws = {rng.randint(1, 3) for _ in range(500)}
+    assert draws == {1, 2, 3}
+
+
+def test_simple_rng_spawn_and_replay():
+    root = SimpleRNG()
+    first, second = root.spawn(2)
+    (third,) = root.spawn(1)
+    replay = SimpleRNG(second.seed, spawn_key=second.spawn_key)
+
+    assert [first.spawn_key, second.spawn_key, third.spawn_key] == [(0,), (1,), (2,)]
+    assert [second.uniform(0, 1) for _ in range(10)] == [replay.uniform(0, 1) for _ in range(10)]
+    assert first.random() != second.random()
+
+
+def test_new_rng_falls_back_without_numpy(monkeypatch):
+    monkeypatch.setattr(batchedRandom, "np", None)
+    rng = new_rng(5)
+
+    assert isinstance(rng, SimpleRNG)
+    assert rng.seed == 5
+    with pytest.raises(ImportError):
+        BatchedRNG(5)
@@ -0,0 +1,85 @@
+import threading
+
+import pytest
+
+from ch9329Device import CH9329Device
+from inputBitmasks import KEY_A
+from inputEvent import CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA, _build_keyboard_frame, _build_mouse_rel_frame
+
+
+def test_frames_stay_whole_and_ordered_with_many_producers(port):
+    dev = CH9329Device(port)
+    producers, per_thread = 8, 200
+
+    def produce(tid: int) -> None:
+        barrier.wait()
+        for i in range(per_thread):
+            # dx numbers the frame, dy names the thread.
+            dev.mouse_move(i % 100, tid)
+
+    barrier = threading.Barrier(producers)
+    threads = [threading.Thread(target=produce, args=(tid,)) for tid in range(producers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    dev.close()
+
+    frames = port.frames()
+    assert len(frames) == producers * per_thread
+    assert all(cmd == CMD_SEND_MS_REL_DATA for _addr, cmd, _data in frames)
+    for tid in range(producers):
+        dxs = [data[2] for _addr, _cmd, data in frames if data[3] == tid]
+        assert dxs == [i % 100 for i in range(per_thread)]
+
+
+def test_waiting_frames_are_coalesced_into_one_write(port):
+    dev = CH9329Device(port)
+    frames = [_build_mouse_rel_frame(1, 0) for _ in range(10)]
+
+    # Park the writer thread on a job while the frames queue up.
+    busy, gate = threading.Event(), threading.Event()
+
+    def block(ser) -> None:
+        busy.set()
+        gate.wait()
+
+    blocker = threading.Thread(target=dev.call, args=(block,))
+    blocker.start()
+    busy.wait()
+    for frame in frames:
+        dev.submit(frame)
+    gate.set()
+    blocker.join()
+    dev.close()
+
+    assert port.writes == [b"".join(frames)]
+
+
+def test_submit_after_close_raises(port):
+    dev = CH9329Device(port)
+    dev.close()
+    with pytest.raises(RuntimeError):
+        dev.submit(_build_mouse_rel_frame(1, 0))
+    with pytest.raises(RuntimeError):
+        dev.call(lambda ser: None)
+    assert port.closed
+
+
+def test_close_fails_events_held_for_a_disconnected_host(port):
+    dev = CH9329Device(port)
+    dev.set_host_connected(False)
+    fut = dev.submit(_build_keyboard_frame([KEY_A]))
+    dev.close()
+
+    with pytest.raises(RuntimeError):
+        fut.result(timeout=1)
+    assert port.writes == []
+
+
+def test_flush_waits_for_this_threads_frames(port):
+    dev = CH9329Device(port)
+    dev.key_down(KEY_A)
+    dev.flush()
+    assert port.frames()[-1][1] == CMD_SEND_KB_GENERAL_DATA
+    dev.close()
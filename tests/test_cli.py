@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import cli
+from ch9329Device import CH9329Device
+from conftest import FakePort
+from inputEvent import CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA, _build_mouse_rel_frame, get_param_field
+
+
+@pytest.fixture
+def fake_device(monkeypatch):
+    """Route _open_device to a CH9329Device on a FakePort; returns the port."""
+    port = FakePort()
+    monkeypatch.setattr(cli, "_open_device", lambda args, event_log=None: (CH9329Device(port, event_log=event_log), None))
+    return port
+
+
+@pytest.fixture
+def no_device(monkeypatch):
+    def refuse(args, event_log=None):
+        raise AssertionError("device opened for an invalid command")
+
+    monkeypatch.setattr(cli, "_open_device", refuse)
+
+
+def test_config_get_reads_vid_and_pid_little_endian(fake_device, capsys):
+    assert cli.main(["config", "--port", "x", "get", "vid", "pid"]) == 0
+    assert capsys.readouterr().out.split() == ["vid=6790", "pid=57641"]
+
+
+def test_config_set_writes_the_parameter_block(fake_device):
+    assert cli.main(["config", "--port", "x", "set", "pid=0x1234", "kb_release_delay=5"]) == 0
+    assert get_param_field(fake_device.chip.params, "pid") == 0x1234
+    assert fake_device.chip.params[13:15] == [0x34, 0x12]
+    assert get_param_field(fake_device.chip.params, "kb_release_delay") == 5
+
+
+@pytest.mark.parametrize("item", ["vid=0x10000", "pid=zz", "pid=-1", "nope=1", "vid"])
+def test_config_set_rejects_bad_fields_and_values(fake_device, capsys, item):
+    params = list(fake_device.chip.params)
+    assert cli.main(["config", "--port", "x", "set", item]) == 2
+    assert capsys.readouterr().err
+    assert fake_device.chip.params == params
+
+
+def test_run_rejects_routine_names_with_plan(no_device, tmp_path, capsys):
+    plan = tmp_path / "plan.json"
+    plan.write_text(json.dumps({"phases": [{"routines": {"routine_7": 1}}]}))
+
+    assert cli.main(["run", "--port", "x", "routine_7", "--plan", str(plan)]) == 2
+    assert "not both" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("text", [
+    "{not json",
+    json.dumps({"phases": [{"routines": {"routine_99": 1}}]}),
+    json.dumps({"phases": [{"reps": [3, 1], "routines": {"routine_7": 1}}]}),
+    json.dumps([1, 2]),
+])
+def test_run_rejects_a_bad_plan_before_opening_the_port(no_device, tmp_path, capsys, text):
+    plan = tmp_path / "plan.json"
+    plan.write_text(text)
+
+    assert cli.main(["run", "--port", "x", "--plan", str(plan)]) == 2
+    assert capsys.readouterr().err
+
+
+def test_run_unknown_routine_name(no_device, capsys):
+    assert cli.main(["run", "--port", "x", "routine_99"]) == 2
+    assert "routine_99" in capsys.readouterr().err
+
+
+def test_run_named_routine_and_release(fake_device, capsys):
+    assert cli.main(["run", "--port", "x", "routine_7", "--pause", "0", "--seed", "1"]) == 0
+
+    out = capsys.readouterr().out
+    assert json.loads(out[out.index("{"):])["routines"]["routine_7"]["runs"] == 1
+    cmds = [cmd for _addr, cmd, _data in fake_device.frames()]
+    assert cmds[-2:] == [CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA]  # release_all
+    assert fake_device.closed
+
+
+def test_replay_text_trace(fake_device, tmp_path, capsys):
+    trace = tmp_path / "trace.txt"
+    frames = [_build_mouse_rel_frame(dx, 0) for dx in (1, 2, 3)]
+    trace.write_text("# test\n" + "".join(f"{i * 0.01:.3f} {f.hex()}\n" for i, f in enumerate(frames)))
+
+    assert cli.main(["replay", "--port", "x", str(trace), "--speed", "10"]) == 0
+    assert b"".join(fake_device.writes).startswith(b"".join(frames))
+
+
+@pytest.mark.parametrize("line", ["0.0 zz", "0.0", "0.0 57ab00050501000a0a0022"])
+def test_replay_rejects_bad_trace_lines(no_device, tmp_path, capsys, line):
+    trace = tmp_path / "trace.txt"
+    trace.write_text(line + "\n")
+
+    assert cli.main(["replay", "--port", "x", str(trace)]) == 2
+    assert "trace.txt:1" in capsys.readouterr().err
+
+
+def test_bench_without_link(no_device, capsys):
+    assert cli.main(["bench", "--no-link", "--frames", "100"]) == 0
+    assert "frame build" in capsys.readouterr().out
@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+import eventLog
+from ch9329Device import CH9329Device
+from conftest import FakePort
+from eventLog import ACK_UNKNOWN, PAYLOAD_BYTES, EventLog, is_snapshot
+from inputEvent import CMD_SEND_MS_REL_DATA, _build_mouse_rel_frame, _get_info
+from virtualChip import VirtualCH9329
+
+
+def test_ring_keeps_the_newest_records():
+    log = EventLog(3)
+    for i in range(5):
+        log.append(0x05, bytes([i]), ts=float(i))
+
+    assert len(log) == 3
+    assert log.evicted == 2
+    assert [ts for ts, _cmd, _payload, _ack in log] == [2.0, 3.0, 4.0]
+    assert log.set_ack(0, 0x00) is False  # evicted
+    assert log.set_ack(4, 0x00) is True
+    assert list(log)[-1][3] == 0x00
+
+
+def test_long_payloads_are_truncated():
+    log = EventLog(2)
+    log.append(0x09, bytes(range(50)))
+    (_ts, _cmd, payload, ack), = log
+
+    assert payload == bytes(range(PAYLOAD_BYTES))
+    assert ack == ACK_UNKNOWN
+
+
+def test_snapshot_round_trip_after_wrapping(tmp_path):
+    log = EventLog(4)
+    for i in range(6):
+        log.append(0x02, bytes([i, i]), ts=100.0 + i, ack=i)
+    path = tmp_path / "log.ch9log"
+
+    assert log.snapshot(path) == 4
+    assert is_snapshot(path)
+    assert list(EventLog.load(path)) == list(log)
+
+
+def test_snapshot_writes_the_file_without_holding_the_lock(tmp_path, monkeypatch):
+    log = EventLog(8)
+    log.append(0x05, b"\x00")
+    locked_during_write = []
+
+    class Probe:
+        def __init__(self, path, mode):
+            self.f = open(path, mode)
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            self.f.close()
+
+        def write(self, data):
+            locked_during_write.append(log._lock.locked())
+            self.f.write(data)
+
+        def writelines(self, chunks):
+            for chunk in chunks:
+                self.write(chunk)
+
+    monkeypatch.setattr(eventLog, "open", Probe, raising=False)
+    log.snapshot(tmp_path / "log.ch9log")
+
+    assert locked_during_write and not any(locked_during_write)
+
+
+def test_device_logs_submit_times_and_acks_for_a_coalesced_batch(port):
+    log = EventLog(16)
+    dev = CH9329Device(port, event_log=log)
+
+    busy, gate = threading.Event(), threading.Event()
+
+    def block(ser) -> None:
+        busy.set()
+        gate.wait()
+
+    blocker = threading.Thread(target=dev.call, args=(block,))
+    blocker.start()
+    busy.wait()
+    for dx in range(3):
+        dev.submit(_build_mouse_rel_frame(dx, 0))
+        time.sleep(0.02)
+    gate.set()
+    blocker.join()
+    dev.close()
+
+    assert port.writes[-1] == b"".join(_build_mouse_rel_frame(dx, 0) for dx in range(3))  # one write
+    records = list(log)
+    stamps = [ts for ts, _cmd, _payload, _ack in records]
+    assert all(b - a >= 0.015 for a, b in zip(stamps, stamps[1:]))
+    assert [(cmd, ack) for _ts, cmd, _payload, ack in records] == [(CMD_SEND_MS_REL_DATA, 0x00)] * 3
+
+
+def test_device_logs_error_acks_and_keeps_matching_after_a_job():
+    class PickyChip(VirtualCH9329):
+        def _handle(self, cmd, payload):
+            if cmd == CMD_SEND_MS_REL_DATA and payload[2] == 0x7F:
+                return [0xE1]
+            return super()._handle(cmd, payload)
+
+    port = FakePort(PickyChip())
+    log = EventLog(16)
+    dev = CH9329Device(port, event_log=log)
+    dev.mouse_move(1, 0)
+    dev.mouse_move(0x7F, 0)
+    assert dev.call(_get_info)["usb_connected"] is True
+    dev.mouse_move(2, 0)
+    dev.close()
+
+    assert [ack for _ts, _cmd, _payload, ack in log] == [0x00, 0xE1, 0x00]
+
+
+def test_snapshot_during_a_session(port, tmp_path):
+    log = EventLog(1000)
+    dev = CH9329Device(port, event_log=log)
+    for dx in range(50):
+        dev.mouse_move(dx % 10, 0)
+        if dx == 25:
+            log.snapshot(tmp_path / "mid.ch9log")
+    dev.close()
+
+    mid = list(EventLog.load(tmp_path / "mid.ch9log"))
+    assert 0 < len(mid) <= 50
+    assert [payload for _ts, _cmd, payload, _ack in mid] == [p for _ts, _cmd, p, _ack in list(log)[:len(mid)]]
+
+
+@pytest.fixture(autouse=True)
+def _no_stray_threads():
+    yield
+    assert not [t for t in threading.enumerate() if t.name == "ch9329-writer"]
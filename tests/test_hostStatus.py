@@ -0,0 +1,114 @@
+import threading
+
+import pytest
+
+from ch9329Device import CH9329Device
+from hostStatus import HostStatusMonitor
+from inputBitmasks import KEY_A, MOUSE_LEFT
+from inputEvent import _build_keyboard_frame, _build_mouse_rel_frame, _get_info
+
+
+def test_gating_drops_motion_and_replays_held_events_in_order(port):
+    dev = CH9329Device(port)
+    dev.set_host_connected(False)
+
+    moved = dev.submit(_build_mouse_rel_frame(5, 5))
+    press = _build_mouse_rel_frame(0, 0, buttons=MOUSE_LEFT)
+    key = _build_keyboard_frame([KEY_A])
+    release = _build_mouse_rel_frame(3, 0, buttons=0x00)
+    held = [dev.submit(frame) for frame in (press, key, release)]
+
+    assert moved.done()
+    assert not any(fut.done() for fut in held)
+    assert dev.stats["dropped_motion"] == 1
+    assert dev.stats["held_while_disconnected"] == 3
+
+    dev.set_host_connected(True)
+    after = _build_mouse_rel_frame(7, 0)
+    dev.submit(after)
+    dev.drain()
+
+    assert b"".join(port.writes) == press + key + release + after
+    assert all(fut.done() for fut in held)
+    dev.close()
+
+
+def test_get_info_skips_acks_still_in_flight(port):
+    for dx in range(5):
+        port.write(_build_mouse_rel_frame(dx, 0))
+    port.reset_input_buffer()  # the acks haven't arrived yet
+
+    assert _get_info(port)["usb_connected"] is True
+
+
+def test_poll_succeeds_while_frames_are_streaming(port):
+    dev = CH9329Device(port)
+    monitor = HostStatusMonitor(dev)
+    done = threading.Event()
+
+    def stream() -> None:
+        while not done.is_set():
+            dev.mouse_move(1, 0)
+
+    streamer = threading.Thread(target=stream)
+    streamer.start()
+    try:
+        for _ in range(20):
+            assert monitor.poll()["usb_connected"] is True
+    finally:
+        done.set()
+        streamer.join()
+        dev.close()
+
+    assert monitor.stats == {"polls": 20, "skipped": 0, "errors": 0}
+
+
+def test_poll_gates_the_device_until_the_host_returns(port):
+    dev = CH9329Device(port)
+    monitor = HostStatusMonitor(dev, ttl=60.0)
+
+    port.chip.usb_connected = False
+    monitor.poll()
+    assert monitor.connected is False
+    dev.mouse_move(5, 0)
+    key = dev.submit(_build_keyboard_frame([KEY_A]))
+    assert dev.stats["dropped_motion"] == 1
+    assert not key.done()
+
+    port.chip.usb_connected = True
+    monitor.poll()
+    key.result(timeout=1)
+    dev.close()
+
+
+def test_stop_ungates_the_device(port):
+    dev = CH9329Device(port)
+    monitor = HostStatusMonitor(dev, interval=0.01)
+    port.chip.usb_connected = False
+    monitor.start()
+    while monitor.stats["polls"] == 0:
+        threading.Event().wait(0.01)
+    monitor.stop()
+
+    assert dev._host_connected is True
+    dev.close()
+
+
+def test_monitor_loop_on_a_virtual_chip_with_a_mouse_stream():
+    pytest.importorskip("serial")
+    from virtualChip import VirtualCH9329
+
+    with VirtualCH9329(baudrate=9600) as chip:
+        dev = CH9329Device.open(chip.port)
+        dev.calibrate()
+        monitor = HostStatusMonitor(dev, interval=0.05)
+        monitor.start()
+        try:
+            for _ in range(60):
+                dev.mouse_move(1, 0)
+        finally:
+            monitor.stop()
+            dev.close()
+
+    assert monitor.stats["polls"] > 0
+    assert monitor.stats["errors"] == 0
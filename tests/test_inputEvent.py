@@ -0,0 +1,89 @@
+import gc
+
+import inputEvent
+from conftest import FakePort
+from inputBitmasks import MOUSE_LEFT, MOUSE_RIGHT
+from inputEvent import (
+    CMD_SEND_KB_GENERAL_DATA,
+    get_param_field,
+    mouse_state,
+    release_all,
+    set_param_field,
+)
+
+
+def _mouse(frames):
+    """(buttons, dx, dy, wheel) of each mouse frame."""
+    return [(d[1], d[2], d[3], d[4]) for _addr, cmd, d in frames if cmd != CMD_SEND_KB_GENERAL_DATA]
+
+
+def test_wheel_ticks_ride_on_the_next_move(port):
+    mouse = mouse_state(port)
+    mouse.wheel(-1)
+    mouse.wheel(-2)
+    mouse.move(10, 4)
+
+    assert _mouse(port.frames()) == [(0x00, 10, 4, 0xFD)]
+    assert mouse.stats == {"frames": 1, "folded": 1}
+
+
+def test_wheel_sum_is_capped_at_a_signed_byte(port):
+    mouse = mouse_state(port)
+    mouse.wheel(100)
+    mouse.wheel(100)
+    mouse.flush()
+
+    assert _mouse(port.frames()) == [(0x00, 0, 0, 100), (0x00, 0, 0, 100)]
+
+
+def test_press_starts_a_drag_in_one_frame_and_release_is_immediate(port):
+    mouse = mouse_state(port)
+    mouse.press(MOUSE_LEFT)
+    assert port.writes == []
+
+    mouse.move(3, 0)
+    mouse.release(MOUSE_LEFT)
+    mouse.move(1, 0)
+
+    assert _mouse(port.frames()) == [(MOUSE_LEFT, 3, 0, 0), (0x00, 0, 0, 0), (0x00, 1, 0, 0)]
+
+
+def test_press_then_release_without_a_move_is_still_a_click(port):
+    mouse = mouse_state(port)
+    mouse.press(MOUSE_RIGHT)
+    mouse.release(MOUSE_RIGHT)
+
+    assert _mouse(port.frames()) == [(MOUSE_RIGHT, 0, 0, 0), (0x00, 0, 0, 0)]
+
+
+def test_raw_helpers_keep_the_engine_in_step(port):
+    mouse = mouse_state(port)
+    mouse.wheel(2)
+    mouse.press(MOUSE_LEFT)
+    release_all(port)
+    mouse.move(1, 1)
+
+    assert _mouse(port.frames()) == [(0x00, 0, 0, 0), (0x00, 1, 1, 0)]
+
+    inputEvent.mouse_down(port, MOUSE_LEFT)
+    assert mouse.buttons == MOUSE_LEFT
+
+
+def test_engine_does_not_keep_its_port_alive():
+    port = FakePort()  # not the fixture: pytest keeps that one alive
+    mouse_state(port)
+    count = len(inputEvent._mouse_states)
+    del port
+    gc.collect()
+    assert len(inputEvent._mouse_states) == count - 1
+
+
+def test_param_fields_use_the_chips_byte_order():
+    params = [0x00] * 50
+    set_param_field(params, "baudrate", 9600)
+    set_param_field(params, "vid", 0x1A86)
+    set_param_field(params, "pid", 0xE129)
+
+    assert params[3:7] == [0x00, 0x00, 0x25, 0x80]
+    assert params[11:15] == [0x86, 0x1A, 0x29, 0xE1]
+    assert get_param_field(params, "vid") == 0x1A86
@@ -0,0 +1,89 @@
+import pytest
+
+from ch9329Device import CH9329Device
+from conftest import FakePort
+from inputBitmasks import MOUSE_LEFT
+from inputEvent import CMD_GET_INFO, CMD_SEND_MS_REL_DATA, _build_mouse_rel_frame
+from linkPacing import LinkCalibration, LinkPacer, calibrate_link
+from virtualChip import VirtualCH9329
+
+
+class SilentChip(VirtualCH9329):
+    """Stops answering once `silent` is set."""
+
+    silent = False
+
+    def _handle(self, cmd, payload):
+        return None if self.silent else super()._handle(cmd, payload)
+
+
+def test_retune_derives_interval_and_depth():
+    pacer = LinkPacer(target_latency=0.05)
+    pacer.retune(LinkCalibration(9600, 100.0, 0.005))
+
+    assert pacer.frame_interval == pytest.approx(0.01)
+    assert pacer.max_depth == 5
+    assert pacer.observed_latency == 0.005
+
+
+def test_observe_reports_drift_past_the_calibrated_latency():
+    pacer = LinkPacer(target_latency=0.05, drift_factor=2.0, smoothing=1.0)
+    assert pacer.observe(10.0) is False  # not calibrated yet
+
+    pacer.retune(LinkCalibration(9600, 100.0, 0.005))  # expects 5 ms + 5 * 10 ms
+    assert pacer.observe(0.1) is False
+    assert pacer.observe(0.2) is True
+
+
+def test_calibrate_link_times_report_acks_with_acks_still_in_flight(port):
+    for dx in range(8):
+        port.write(_build_mouse_rel_frame(dx, 0))
+
+    cal = calibrate_link(port, rounds=3, burst=4, buttons=MOUSE_LEFT)
+
+    assert cal.frames_per_s > 0
+    assert port.chip.frames[CMD_GET_INFO] == 3
+    burst = [data for _addr, cmd, data in port.frames()[-4:]]
+    assert all(cmd == CMD_SEND_MS_REL_DATA for _addr, cmd, _data in port.frames()[-4:])
+    assert all(data[1] == MOUSE_LEFT and data[2:] == bytes(3) for data in burst)
+
+
+def test_calibrate_link_fails_when_reports_are_not_acked():
+    class NoAckChip(VirtualCH9329):
+        def _handle(self, cmd, payload):
+            return None if cmd == CMD_SEND_MS_REL_DATA else super()._handle(cmd, payload)
+
+    with pytest.raises(RuntimeError, match="acked only 0 of 4"):
+        calibrate_link(FakePort(NoAckChip()), rounds=1, burst=4)
+
+
+def test_device_recalibrates_on_drift(port):
+    dev = CH9329Device(port)
+    pacer = dev.calibrate(LinkPacer(drift_factor=0.0))
+    first = pacer.calibration
+
+    for _ in range(5):
+        dev.mouse_move(1, 0)
+    dev.drain()
+
+    assert dev.stats["recalibrations"] > 0
+    assert dev.stats["recalibration_failures"] == 0
+    assert pacer.calibration is not first
+    dev.close()
+
+
+def test_failed_recalibration_is_counted_and_keeps_the_old_pacing():
+    chip = SilentChip()
+    dev = CH9329Device(FakePort(chip))
+    pacer = dev.calibrate(LinkPacer(drift_factor=0.0))
+    first = pacer.calibration
+
+    chip.silent = True
+    dev.mouse_move(1, 0)
+    dev.drain()
+
+    assert dev.stats["recalibrations"] == 0
+    assert dev.stats["recalibration_failures"] == 1
+    assert isinstance(dev.recalibration_error, RuntimeError)
+    assert pacer.calibration is first
+    dev.close()
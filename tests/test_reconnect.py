@@ -0,0 +1,109 @@
+import pytest
+
+import ch9329Device
+from ch9329Device import CH9329Device
+from conftest import FakePort
+from inputBitmasks import MOUSE_LEFT
+from inputEvent import (
+    CMD_GET_INFO,
+    CMD_SEND_KB_GENERAL_DATA,
+    CMD_SEND_MS_REL_DATA,
+    _build_mouse_rel_frame,
+    mouse_state,
+)
+
+
+def _reconnectable(monkeypatch, known=("/dev/ttyUSB0",)):
+    """A device on a FakePort whose _reopen hands out `dev.replacement`."""
+    monkeypatch.setattr(ch9329Device.glob, "glob", lambda pattern: list(known))
+    port = FakePort()
+    port.port = "/dev/ttyUSB0"
+    port.get_settings = lambda: {}
+    dev = CH9329Device(port, reconnect_timeout=0.5)
+    dev.replacement = FakePort()
+    dev.reopened_with = []
+
+    def reopen(known_ports):
+        dev.reopened_with.append(set(known_ports))
+        return dev.replacement
+
+    monkeypatch.setattr(dev, "_reopen", reopen)
+    return dev, port
+
+
+def test_failed_press_is_retried_then_released(monkeypatch):
+    dev, port = _reconnectable(monkeypatch)
+    port.fail_writes.append(OSError("device disconnected"))
+
+    mouse = mouse_state(dev)
+    mouse.press(MOUSE_LEFT)
+    mouse.flush()
+    mouse.release(MOUSE_LEFT)  # the release-all already did this
+    dev.drain()
+
+    new = dev.replacement
+    cmds = [cmd for _addr, cmd, _data in new.frames()]
+    assert cmds == [CMD_GET_INFO, CMD_SEND_MS_REL_DATA, CMD_SEND_KB_GENERAL_DATA, CMD_SEND_MS_REL_DATA]
+    press, release = new.frames()[1][2], new.frames()[3][2]
+    assert press[1] == MOUSE_LEFT
+    assert release[1] == 0x00  # the last report the host saw has no buttons
+    assert mouse.buttons == 0x00
+    assert port.closed
+    assert dev.stats["reconnects"] == 1
+    dev.close()
+
+
+def test_frames_after_a_reconnect_go_to_the_new_port(monkeypatch):
+    dev, port = _reconnectable(monkeypatch)
+    port.fail_writes.append(OSError("device disconnected"))
+
+    dev.mouse_move(1, 0)
+    dev.flush()
+    dev.mouse_move(2, 0)
+    dev.drain()
+
+    moves = [data[2] for _addr, cmd, data in dev.replacement.frames() if cmd == CMD_SEND_MS_REL_DATA]
+    assert moves == [1, 0, 2]  # retried move, release-all, next move
+    dev.close()
+
+
+def test_gives_up_after_reconnect_timeout(monkeypatch):
+    dev, port = _reconnectable(monkeypatch)
+    dev.replacement = None
+    dev.reconnect_timeout = 0.1
+    port.fail_writes.append(OSError("device disconnected"))
+
+    fut = dev.submit(_build_mouse_rel_frame(1, 0))
+    with pytest.raises(OSError):
+        fut.result(timeout=2)
+    assert dev.stats["reconnect_failures"] == 1
+    assert dev.stats["reconnects"] == 0
+    dev.close()
+
+
+def test_write_timeout_does_not_reopen_the_port(monkeypatch):
+    serial = pytest.importorskip("serial")
+    dev, port = _reconnectable(monkeypatch)
+    port.fail_writes.append(serial.SerialTimeoutException("Write timeout"))
+
+    fut = dev.submit(_build_mouse_rel_frame(1, 0))
+    with pytest.raises(serial.SerialTimeoutException):
+        fut.result(timeout=2)
+    assert dev.reopened_with == []
+    assert not port.closed
+    assert dev.stats["write_timeouts"] == 1
+    dev.close()
+
+
+def test_known_ports_are_snapshotted_when_the_port_is_opened(monkeypatch):
+    known = ["/dev/ttyUSB0"]
+    dev, port = _reconnectable(monkeypatch, known)
+    known.append("/dev/ttyUSB1")  # re-enumerated before the failure is noticed
+    port.fail_writes.append(OSError("device disconnected"))
+
+    dev.mouse_move(1, 0)
+    dev.drain()
+
+    assert dev.reopened_with[0] == {"/dev/ttyUSB0"}
+    assert dev._known_ports == {"/dev/ttyUSB0", "/dev/ttyUSB1"}  # refreshed after the reconnect
+    dev.close()
@@ -0,0 +1,150 @@
+import threading
+
+import pytest
+
+from routineScheduler import RoutineScheduler
+
+
+def _recorder():
+    calls = []
+    routines = {
+        name: (lambda ser, rng, _name=name: calls.append(_name))
+        for name in ("a", "b", "c")
+    }
+    return calls, routines
+
+
+def _run(sched, timeout=5.0):
+    thread = sched.start()
+    thread.join(timeout)
+    alive = thread.is_alive()
+    sched.stop()
+    assert not alive, "scheduler did not finish"
+
+
+def test_one_pass_runs_every_shuffled_routine_once():
+    calls, routines = _recorder()
+    plan = {"phases": [{"routines": {"a": 1, "b": 1, "c": 1}}]}
+    _run(RoutineScheduler(None, plan, routines, seed=1))
+
+    assert sorted(calls) == ["a", "b", "c"]
+
+
+def test_weight_zero_routines_never_run():
+    calls, routines = _recorder()
+    plan = {"phases": [{"mode": "weighted", "draws": 20, "routines": {"a": 1, "b": 0}}]}
+    _run(RoutineScheduler(None, plan, routines, seed=1))
+
+    assert calls == ["a"] * 20
+
+
+def test_looping_plan_ends_when_every_routine_hits_its_limit():
+    calls, routines = _recorder()
+    plan = {
+        "loop": True,
+        "limits": {"a": {"max_runs": 3}, "b": {"max_runs": 2}},
+        "phases": [{"routines": {"a": 1, "b": 1}}],
+    }
+    sched = RoutineScheduler(None, plan, routines, seed=1)
+    _run(sched)
+
+    assert calls.count("a") == 3
+    assert calls.count("b") == 2
+    assert sched.stats()["a"]["runs"] == 3
+
+
+def test_plan_budget_stops_a_looping_plan():
+    calls, routines = _recorder()
+    plan = {"loop": True, "budget_s": 0.3, "phases": [{"routines": {"a": 1}, "pause": (0.05, 0.05)}]}
+    _run(RoutineScheduler(None, plan, routines, seed=1))
+
+    assert 1 <= len(calls) <= 10
+
+
+@pytest.mark.parametrize("phase", [
+    {"routines": {"a": 0, "b": 0}},
+    {"mode": "weighted", "draws": 0, "routines": {"a": 1}},
+    {"reps": (0, 0), "routines": {"a": 1}},
+])
+def test_plans_with_nothing_runnable_are_rejected(phase):
+    _calls, routines = _recorder()
+    with pytest.raises(ValueError):
+        RoutineScheduler(None, {"loop": True, "phases": [phase]}, routines)
+
+
+def test_same_seed_replays_the_same_order():
+    orders = []
+    for _ in range(2):
+        calls, routines = _recorder()
+        plan = {"phases": [{"mode": "weighted", "draws": 10, "routines": {"a": 1, "b": 2, "c": 3}}]}
+        _run(RoutineScheduler(None, plan, routines, seed=42))
+        orders.append(calls)
+
+    assert orders[0] == orders[1]
+
+
+def test_stop_cuts_a_pause_short():
+    calls, routines = _recorder()
+    plan = {"loop": True, "phases": [{"routines": {"a": 1}, "pause": (30.0, 30.0)}]}
+    sched = RoutineScheduler(None, plan, routines, seed=1)
+    thread = sched.start()
+    while not calls:
+        threading.Event().wait(0.01)
+    sched.stop()
+
+    assert not thread.is_alive()
+
+
+@pytest.mark.parametrize("phase", [
+    {"reps": (3, 1), "routines": {"a": 1}},
+    {"pause": (1,), "routines": {"a": 1}},
+    {"pause": (-1.0, 1.0), "routines": {"a": 1}},
+    {"routines": {"a": {"weight": 1, "reps": "3"}}},
+    {"mode": "weighted", "draws": -1, "routines": {"a": 1}},
+    {"mode": "weighted", "draws": 2.5, "routines": {"a": 1}},
+    {"routines": {"a": -1}},
+])
+def test_malformed_ranges_are_rejected(phase):
+    _calls, routines = _recorder()
+    with pytest.raises(ValueError):
+        RoutineScheduler(None, {"phases": [phase]}, routines)
+
+
+def test_compiler_errors_are_raised_from_run():
+    _calls, routines = _recorder()
+    sched = RoutineScheduler(None, {"loop": True, "phases": [{"routines": {"a": 1}}]}, routines, seed=1)
+
+    def broken(pass_no, index, phase):
+        raise KeyError("boom")
+        yield
+
+    sched._compile_phase = broken
+    raised = []
+
+    def target() -> None:
+        try:
+            sched.run()
+        except KeyError as exc:
+            raised.append(exc)
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive(), "run() hung after the compiler died"
+    assert len(raised) == 1
+
+
+def test_stop_right_after_start_is_not_lost():
+    class SlowStart(RoutineScheduler):
+        def run(self):
+            threading.Event().wait(0.01)  # stop() lands before run() begins
+            super().run()
+
+    _calls, routines = _recorder()
+    sched = SlowStart(None, {"loop": True, "phases": [{"routines": {"a": 1}}]}, routines, seed=1)
+    sched.start()
+    stopper = threading.Thread(target=sched.stop, daemon=True)
+    stopper.start()
+    stopper.join(5)
+
+    assert not stopper.is_alive()